@@ -0,0 +1,143 @@
+"""Per-process read cache for note GETs with single-flight loading."""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+NOTE_CACHE_MAX_BYTES = int(os.getenv("NOTE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Rough per-object overhead on top of the text payload
+ENTRY_OVERHEAD_BYTES = 256
+
+
+def estimate_size(value) -> int:
+    """Approximate the memory held by a cached note or list of notes."""
+    if isinstance(value, list):
+        return ENTRY_OVERHEAD_BYTES + sum(estimate_size(item) for item in value)
+    return ENTRY_OVERHEAD_BYTES + len(value.title or "") + len(value.content or "")
+
+
+class NoteReadCache:
+    """
+    LRU cache of read results keyed by user, bounded by an approximate byte budget.
+
+    Concurrent misses for the same key share a single load. Writers call
+    `invalidate_user` after committing, which also detaches the user's
+    in-flight loads so results that raced with the write are not cached.
+    No state is kept for users without entries or loads. The cache is
+    per process, so writes made by other processes are not seen until the
+    entry is evicted or invalidated locally.
+    """
+
+    def __init__(self, max_bytes: int = NOTE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, tuple[object, int]] = OrderedDict()
+        self._user_keys: dict[str, set[tuple]] = {}
+        self._inflight: dict[tuple, Future] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get_or_load(self, username: str, key: tuple, loader):
+        """Return the cached value for key, loading it at most once at a time on a miss."""
+        key = (username, *key)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                self.misses += 1
+                flight = self._inflight[key] = Future()
+                leader = True
+        if not leader:
+            return flight.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                self._end_flight(key, flight)
+            flight.set_exception(e)
+            raise
+
+        with self._lock:
+            # Still registered means no invalidation happened while loading
+            if self._end_flight(key, flight):
+                self._store(username, key, value)
+        flight.set_result(value)
+        return value
+
+    def invalidate_user(self, username: str):
+        """Drop every cached read for a user. Call after committing a write."""
+        with self._lock:
+            for key in self._user_keys.pop(username, ()):
+                _, size = self._entries.pop(key)
+                self._bytes -= size
+            # Later callers must not join loads that started before the write
+            for key in [key for key in self._inflight if key[0] == username]:
+                del self._inflight[key]
+
+    def clear(self):
+        """Drop all entries and reset the metrics."""
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+            self._inflight.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.coalesced = self.evictions = 0
+
+    def stats(self) -> dict:
+        """Hit ratio and memory usage metrics."""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            }
+
+    def _end_flight(self, key: tuple, flight: Future) -> bool:
+        """Unregister the flight. Returns False if it was already detached."""
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+            return True
+        return False
+
+    def _store(self, username: str, key: tuple, value):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, size)
+        self._user_keys.setdefault(username, set()).add(key)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            old_key, (_, old_size) = self._entries.popitem(last=False)
+            self._bytes -= old_size
+            self.evictions += 1
+            owner_keys = self._user_keys.get(old_key[0])
+            if owner_keys is not None:
+                owner_keys.discard(old_key)
+                if not owner_keys:
+                    del self._user_keys[old_key[0]]
+
+
+note_cache = NoteReadCache()
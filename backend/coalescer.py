@@ -0,0 +1,201 @@
+"""Per-process write coalescing for note autosaves."""
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+from sqlmodel import Session, update
+
+from models import Note, NotePatch, NotePublic
+from patching import apply_patch
+
+load_dotenv()
+
+NOTE_COALESCE_SECONDS = float(os.getenv("NOTE_COALESCE_SECONDS", "2"))
+
+# Notes hash onto a fixed set of locks, so memory stays bounded without pruning
+NOTE_LOCK_STRIPES = 64
+
+
+class StaleVersionError(Exception):
+    """Raised when a patch targets a version that is no longer current."""
+
+
+@dataclass
+class PendingNote:
+    username: str
+    title: str | None
+    content: str | None
+    version: int
+    updated_at: datetime
+    flush_at: float
+    # Version of the row in the database, which pending writes are conditional on
+    db_version: int
+
+
+class NoteCoalescer:
+    """
+    Merge rapid successive patches to a note into a single commit.
+
+    The first patch after a quiet period is committed immediately. Patches
+    arriving within `window` seconds of that commit are held in memory and
+    written together once the window closes, or earlier when the note is
+    read or otherwise written through this process.
+
+    Work on a note, including its database write, is serialized by that
+    note's striped lock. The shared lock only guards the bookkeeping dicts.
+    """
+
+    def __init__(self, window: float = NOTE_COALESCE_SECONDS):
+        self.window = window
+        self._lock = threading.Lock()
+        self._note_locks = [threading.Lock() for _ in range(NOTE_LOCK_STRIPES)]
+        self._pending: dict[str, PendingNote] = {}
+        self._last_commit: dict[str, float] = {}
+
+    def apply(self, session: Session, db_note: Note, patch: NotePatch) -> NotePublic:
+        """Apply a patch on top of the latest known state of the note."""
+        with self._note_lock(db_note.id):
+            with self._lock:
+                pending = self._pending.get(db_note.id)
+                last_commit = self._last_commit.get(db_note.id)
+            if pending is None:
+                # The row may have changed since the request loaded it
+                session.refresh(db_note)
+            current = pending or db_note
+            db_version = pending.db_version if pending else db_note.version
+            if patch.base_version != current.version:
+                raise StaleVersionError(
+                    f"Base version {patch.base_version} is stale, current version is {current.version}"
+                )
+
+            title = patch.title if patch.title is not None else current.title
+            content = apply_patch(current.content, patch.edits, patch.diff)
+            version = current.version + 1
+            updated_at = datetime.now(timezone.utc)
+
+            now = time.monotonic()
+            if self.window <= 0 or last_commit is None or now - last_commit >= self.window:
+                values = {"title": title, "content": content, "version": version, "updated_at": updated_at}
+                written = self._write(session, db_note.id, db_version, values)
+                with self._lock:
+                    self._pending.pop(db_note.id, None)
+                    if written:
+                        self._last_commit[db_note.id] = now
+                if not written:
+                    raise StaleVersionError(f"Note was modified concurrently, base version {db_version} is stale")
+                session.refresh(db_note)
+                return NotePublic.model_validate(db_note)
+
+            with self._lock:
+                self._pending[db_note.id] = PendingNote(
+                    username=db_note.username,
+                    title=title,
+                    content=content,
+                    version=version,
+                    updated_at=updated_at,
+                    flush_at=last_commit + self.window,
+                    db_version=db_version,
+                )
+            return NotePublic.model_validate(
+                db_note,
+                update={"title": title, "content": content, "version": version, "updated_at": updated_at},
+            )
+
+    def replace(self, session: Session, db_note: Note, values: dict):
+        """
+        Overwrite fields of the note and bump its version, after writing any
+        pending patches. The write is conditional on the version loaded here,
+        so a concurrent write from another process raises StaleVersionError.
+        """
+        with self._note_lock(db_note.id):
+            self._flush_locked(session, db_note.id)
+            session.refresh(db_note)
+            values = {**values, "version": db_note.version + 1, "updated_at": datetime.now(timezone.utc)}
+            if not self._write(session, db_note.id, db_note.version, values):
+                raise StaleVersionError(f"Note was modified concurrently, version {db_note.version} is stale")
+            session.refresh(db_note)
+
+    def flush_note(self, session: Session, note_id: str):
+        """Write any pending state for a single note."""
+        self._flush(session, lambda key, pending: key == note_id)
+
+    def flush_user(self, session: Session, username: str):
+        """Write any pending state for all notes of a user."""
+        self._flush(session, lambda key, pending: pending.username == username)
+
+    def flush_expired(self, session: Session):
+        """Write pending notes whose coalescing window has closed."""
+        now = time.monotonic()
+        self._flush(session, lambda key, pending: pending.flush_at <= now)
+        with self._lock:
+            for key, last_commit in list(self._last_commit.items()):
+                if now - last_commit >= self.window and key not in self._pending:
+                    del self._last_commit[key]
+
+    def flush_all(self, session: Session):
+        """Write every pending note, e.g. on shutdown."""
+        self._flush(session, lambda key, pending: True)
+
+    def discard_note(self, note_id: str):
+        """Drop pending state for a note that is being deleted."""
+        with self._lock:
+            self._pending.pop(note_id, None)
+            self._last_commit.pop(note_id, None)
+
+    def discard_user(self, username: str):
+        """Drop pending state for every note of a user that is being deleted."""
+        with self._lock:
+            for key, pending in list(self._pending.items()):
+                if pending.username == username:
+                    del self._pending[key]
+                    self._last_commit.pop(key, None)
+
+    def clear(self):
+        """Forget all pending state without writing it."""
+        with self._lock:
+            self._pending.clear()
+            self._last_commit.clear()
+
+    def _note_lock(self, note_id: str) -> threading.Lock:
+        return self._note_locks[hash(note_id) % NOTE_LOCK_STRIPES]
+
+    def _flush(self, session: Session, predicate):
+        with self._lock:
+            if not self._pending:
+                return
+            selected = [key for key, pending in self._pending.items() if predicate(key, pending)]
+        for note_id in selected:
+            with self._note_lock(note_id):
+                self._flush_locked(session, note_id)
+
+    def _flush_locked(self, session: Session, note_id: str):
+        """Write pending state for a note whose lock the caller holds."""
+        with self._lock:
+            pending = self._pending.pop(note_id, None)
+        if pending is None:
+            return
+        values = {
+            "title": pending.title,
+            "content": pending.content,
+            "version": pending.version,
+            "updated_at": pending.updated_at,
+        }
+        if self._write(session, note_id, pending.db_version, values):
+            with self._lock:
+                self._last_commit[note_id] = time.monotonic()
+        else:
+            print(f"Dropped coalesced patches for note {note_id}: modified concurrently or deleted")
+
+    def _write(self, session: Session, note_id: str, db_version: int, values: dict) -> bool:
+        """Write values only if the row is still at db_version. Returns False otherwise."""
+        result = session.exec(
+            update(Note).where(Note.id == note_id).where(Note.version == db_version).values(**values)
+        )
+        session.commit()
+        return result.rowcount == 1
+
+
+note_coalescer = NoteCoalescer()
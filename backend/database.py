@@ -1,6 +1,7 @@
 from typing import Annotated
 
 from fastapi import Depends
+from sqlalchemy import inspect, text
 from sqlmodel import Session, SQLModel, create_engine
 
 sqlite_file_name = "database.db"
@@ -10,8 +11,28 @@ connect_args = {"check_same_thread": False}
 engine = create_engine(sqlite_url, connect_args=connect_args)
 
 
+def upgrade_existing_tables(bind=engine):
+    """Add columns and indexes declared on the models but missing from existing tables."""
+    inspector = inspect(bind)
+    with bind.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(bind.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" NOT NULL DEFAULT {column.server_default.arg}"
+                connection.execute(text(ddl))
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    upgrade_existing_tables()
 
 
 def get_session():
@@ -0,0 +1,111 @@
+"""Argon2 password hashing profiles and host calibration."""
+import argparse
+import os
+import time
+from dataclasses import dataclass
+
+from dotenv import load_dotenv
+from pwdlib import PasswordHash
+from pwdlib.hashers.argon2 import Argon2Hasher
+
+load_dotenv()
+
+
+@dataclass(frozen=True)
+class HashingProfile:
+    memory_cost: int  # KiB
+    time_cost: int
+    parallelism: int
+
+
+PROFILES = {
+    # argon2-cffi defaults, as used by PasswordHash.recommended()
+    "default": HashingProfile(memory_cost=65536, time_cost=3, parallelism=4),
+    # OWASP minimum for memory-constrained hosts
+    "low-memory": HashingProfile(memory_cost=19456, time_cost=2, parallelism=1),
+    "high": HashingProfile(memory_cost=262144, time_cost=4, parallelism=4),
+    # Deliberately weak, for the test suite only
+    "test": HashingProfile(memory_cost=8, time_cost=1, parallelism=1),
+}
+
+# Profiles that may only be selected with PASSWORD_HASH_ALLOW_TEST_PROFILE=1
+TEST_ONLY_PROFILES = {"test"}
+
+
+def get_profile() -> HashingProfile:
+    """
+    Resolve the hashing profile from the environment.
+    PASSWORD_HASH_PROFILE selects a named profile, and PASSWORD_HASH_MEMORY_COST,
+    PASSWORD_HASH_TIME_COST and PASSWORD_HASH_PARALLELISM override its fields.
+    """
+    name = os.getenv("PASSWORD_HASH_PROFILE", "default")
+    if name not in PROFILES:
+        raise ValueError(f"Unknown password hash profile {name!r}, expected one of {', '.join(PROFILES)}")
+    if name in TEST_ONLY_PROFILES and os.getenv("PASSWORD_HASH_ALLOW_TEST_PROFILE") != "1":
+        raise ValueError(
+            f"Password hash profile {name!r} is insecure and only allowed with PASSWORD_HASH_ALLOW_TEST_PROFILE=1"
+        )
+    profile = PROFILES[name]
+    return HashingProfile(
+        memory_cost=int(os.getenv("PASSWORD_HASH_MEMORY_COST", profile.memory_cost)),
+        time_cost=int(os.getenv("PASSWORD_HASH_TIME_COST", profile.time_cost)),
+        parallelism=int(os.getenv("PASSWORD_HASH_PARALLELISM", profile.parallelism)),
+    )
+
+
+def build_password_hash(profile: HashingProfile) -> PasswordHash:
+    """Create a PasswordHash that hashes with the given Argon2 parameters."""
+    return PasswordHash((
+        Argon2Hasher(
+            time_cost=profile.time_cost,
+            memory_cost=profile.memory_cost,
+            parallelism=profile.parallelism,
+        ),
+    ))
+
+
+def measure_verify_ms(profile: HashingProfile, rounds: int = 3) -> float:
+    """Median time in milliseconds to verify a password hashed with the profile."""
+    hasher = build_password_hash(profile)
+    hashed = hasher.hash("calibration-password")
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        hasher.verify("calibration-password", hashed)
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+def calibrate(target_ms: float, memory_cost: int = 65536, parallelism: int = 4, max_time_cost: int = 20) -> HashingProfile:
+    """
+    Pick the strongest parameters whose verify latency stays within target_ms.
+    Memory is halved until a single pass fits, then passes are added while they fit.
+    """
+    min_memory = 8 * parallelism
+    profile = HashingProfile(memory_cost=memory_cost, time_cost=1, parallelism=parallelism)
+    while profile.memory_cost > min_memory and measure_verify_ms(profile) > target_ms:
+        profile = HashingProfile(max(profile.memory_cost // 2, min_memory), 1, parallelism)
+
+    while profile.time_cost < max_time_cost:
+        candidate = HashingProfile(profile.memory_cost, profile.time_cost + 1, parallelism)
+        if measure_verify_ms(candidate) > target_ms:
+            break
+        profile = candidate
+    return profile
+
+
+password_hash = build_password_hash(get_profile())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate Argon2 parameters for this host.")
+    parser.add_argument("--target-ms", type=float, default=250, help="Target verify latency in milliseconds")
+    parser.add_argument("--memory-cost", type=int, default=65536, help="Starting memory cost in KiB")
+    parser.add_argument("--parallelism", type=int, default=min(os.cpu_count() or 1, 4))
+    args = parser.parse_args()
+
+    profile = calibrate(args.target_ms, args.memory_cost, args.parallelism)
+    print(f"# Verify takes ~{measure_verify_ms(profile):.0f} ms on this host")
+    print(f"PASSWORD_HASH_MEMORY_COST={profile.memory_cost}")
+    print(f"PASSWORD_HASH_TIME_COST={profile.time_cost}")
+    print(f"PASSWORD_HASH_PARALLELISM={profile.parallelism}")
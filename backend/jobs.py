@@ -0,0 +1,173 @@
+"""In-process background job queue backed by the job table."""
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+from sqlmodel import Session, select, update
+
+from models import Job
+
+load_dotenv()
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_RETRY_DELAY_SECONDS = float(os.getenv("JOB_RETRY_DELAY_SECONDS", "5"))
+
+
+class JobContext:
+    """Handle given to job handlers for reporting progress."""
+
+    def __init__(self, session: Session, job: Job):
+        self.session = session
+        self.job = job
+
+    def report(self, progress: float):
+        """Record progress between 0 and 1. Commits the handler's session."""
+        self.job.progress = min(max(progress, 0.0), 1.0)
+        self.job.updated_at = datetime.now(timezone.utc)
+        self.session.add(self.job)
+        self.session.commit()
+
+
+class JobQueue:
+    """
+    Run registered job handlers on a fixed pool of worker threads.
+
+    Jobs are persisted in the job table, so queued work survives restarts
+    and jobs interrupted mid-run are picked up again on the next start.
+    Failed jobs are retried with exponential backoff up to `max_attempts`.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, poll_interval: float = JOB_POLL_SECONDS,
+                 retry_delay: float = JOB_RETRY_DELAY_SECONDS):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self._handlers = {}
+        self._threads: list[threading.Thread] = []
+        self._stopping = threading.Event()
+        self._wakeup = threading.Event()
+        self._engine = None
+
+    def handler(self, kind: str):
+        """Register a function `handler(session, payload, context)` for a job kind."""
+        def register(func):
+            self._handlers[kind] = func
+            return func
+        return register
+
+    def enqueue(self, session: Session, kind: str, payload: dict, created_by: str, max_attempts: int = 3) -> Job:
+        """Persist a new job and wake a worker to run it."""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind {kind!r}")
+        job = Job(kind=kind, payload=payload, created_by=created_by, max_attempts=max_attempts)
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        self._wakeup.set()
+        return job
+
+    def run_next(self, session: Session) -> bool:
+        """Claim and run the next due job. Returns False if none was waiting."""
+        job = self._claim(session)
+        if job is None:
+            return False
+
+        handler = self._handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for job kind {job.kind!r}")
+            result = handler(session, job.payload, JobContext(session, job))
+        except Exception as e:
+            session.rollback()
+            session.refresh(job)
+            job.error = str(e)
+            if handler is not None and job.attempts < job.max_attempts:
+                job.status = "queued"
+                job.run_after = datetime.now(timezone.utc) + timedelta(
+                    seconds=self.retry_delay * 2 ** (job.attempts - 1)
+                )
+            else:
+                job.status = "failed"
+            print(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed: {e}")
+        else:
+            job.status = "succeeded"
+            job.progress = 1.0
+            job.result = result
+            job.error = None
+        job.updated_at = datetime.now(timezone.utc)
+        session.add(job)
+        session.commit()
+        return True
+
+    def start(self, engine):
+        """Requeue interrupted jobs that have attempts left and start the worker threads."""
+        self._engine = engine
+        self._stopping.clear()
+        now = datetime.now(timezone.utc)
+        with Session(engine) as session:
+            # A job that keeps taking the process down must not be retried forever
+            session.exec(
+                update(Job)
+                .where(Job.status == "running")
+                .where(Job.attempts >= Job.max_attempts)
+                .values(status="failed", error="Interrupted on its last attempt", updated_at=now)
+            )
+            session.exec(
+                update(Job).where(Job.status == "running").values(status="queued", updated_at=now)
+            )
+            session.commit()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10):
+        """Signal the workers to finish their current job and wait for them."""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+
+    def _claim(self, session: Session) -> Job | None:
+        now = datetime.now(timezone.utc)
+        statement = (
+            select(Job.id)
+            .where(Job.status == "queued")
+            .where(Job.run_after <= now)
+            .order_by(Job.run_after)
+            .limit(1)
+        )
+        job_id = session.exec(statement).first()
+        if job_id is None:
+            return None
+        # Conditional update so that only one worker wins the job
+        claimed = session.exec(
+            update(Job)
+            .where(Job.id == job_id)
+            .where(Job.status == "queued")
+            .values(status="running", attempts=Job.attempts + 1, updated_at=now)
+        )
+        session.commit()
+        if claimed.rowcount != 1:
+            return None
+        job = session.get(Job, job_id)
+        session.refresh(job)
+        return job
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                with Session(self._engine) as session:
+                    ran = self.run_next(session)
+            except Exception as e:
+                print(f"Job worker error: {e}")
+                ran = False
+            if not ran:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+
+job_queue = JobQueue()
@@ -1,12 +1,18 @@
+import asyncio
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 
-from routers import notes, users, authentication
-from database import create_db_and_tables
+from routers import notes, users, authentication, jobs, frontend as frontend_router
+from sqlmodel import Session
+from database import create_db_and_tables, engine
 from limiter import limiter
+from coalescer import note_coalescer
+from jobs import job_queue
+from static import frontend, SERVE_FRONTEND
 
 # Description for Swagger UI and API documentation
 description = """
@@ -18,20 +24,52 @@ Notes App API lets users securely manage their personal notes. 📝
 
 ## Notes
 - **Create**, **view**, **update**, and **delete** personal notes.
-- Admin users can view all notes in the system.
+- Fetch up to 100 notes in one request with **batch get**.
+- **Patch** notes with range edits or unified diffs; rapid autosaves are coalesced.
+- Organize notes with **tags** and **folders**, and filter or sort the note list by them.
+- Admin users can stream all notes in the system page by page.
 
 ## Users
 - Retrieve your own profile information.
-- Admins can list all registered users.
+- Admins can page through registered users with note counts and storage usage.
+
+## Jobs
+- Long-running operations such as user deletion run in the background and return a job ID.
+- Poll job status and progress until the job completes.
 """
 
+def flush_pending_notes(expired_only: bool = True):
+    """Write coalesced note patches to the database."""
+    with Session(engine) as session:
+        if expired_only:
+            note_coalescer.flush_expired(session)
+        else:
+            note_coalescer.flush_all(session)
+
+async def flush_pending_notes_periodically():
+    """Flush coalesced note patches once their window has closed."""
+    interval = max(note_coalescer.window, 0.5)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(flush_pending_notes)
+        except Exception as e:
+            print(f"Failed to flush pending notes: {e}")
+
 # Define lifespan method for managing app startup and shutdown events
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Creating tables...")
     create_db_and_tables()
     print("Tables created.")
+    if SERVE_FRONTEND:
+        frontend.build()
+    flusher = asyncio.create_task(flush_pending_notes_periodically())
+    job_queue.start(engine)
     yield
+    job_queue.stop()
+    flusher.cancel()
+    flush_pending_notes(expired_only=False)
 
 origins = [
     "*", 
@@ -64,12 +102,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let cross-origin clients read pagination cursors
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Routers
 app.include_router(users.router, prefix="/user")
 app.include_router(notes.router, prefix="/notes", tags=["notes"])
 app.include_router(authentication.router, tags=["authentication"])
+app.include_router(jobs.router, prefix="/jobs")
+if SERVE_FRONTEND:
+    app.include_router(frontend_router.router, prefix="/app")
 
 
 # Root endpoint
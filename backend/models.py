@@ -1,6 +1,9 @@
 import uuid
+from datetime import datetime, timezone
 from typing import Optional
-from sqlmodel import Field, SQLModel
+from pydantic import field_validator
+from sqlalchemy import JSON, Index, UniqueConstraint
+from sqlmodel import Field, Relationship, SQLModel
 
 # Token
 class Token(SQLModel):
@@ -18,6 +21,8 @@ class UserBase(SQLModel):
 class User(UserBase, table=True):
     id: int | None = Field(default=None, primary_key=True)
     password: str
+    # Set while a deletion job removes the user's data; the row keeps the username reserved
+    deleted: bool = Field(default=False, sa_column_kwargs={"server_default": "0"})
 
 class UserCreate(UserBase):
     password: str
@@ -25,21 +30,123 @@ class UserCreate(UserBase):
 class UserPublic(UserBase):
     id: int
 
+class UserStats(UserPublic):
+    note_count: int = 0
+    storage_bytes: int = 0
+
+# Folders
+class FolderBase(SQLModel):
+    name: str
+
+class Folder(FolderBase, table=True):
+    __table_args__ = (UniqueConstraint("username", "name"),)
+
+    id: int | None = Field(default=None, primary_key=True)
+    username: str
+
+class FolderCreate(FolderBase):
+    pass
+
+class FolderPublic(FolderBase):
+    id: int
+    note_count: int = 0
+
+# Tags
+class NoteTag(SQLModel, table=True):
+    __table_args__ = (Index("ix_notetag_username_tag_id", "username", "tag_id"),)
+
+    note_id: str = Field(foreign_key="note.id", primary_key=True)
+    tag_id: int = Field(foreign_key="tag.id", primary_key=True)
+    username: str
+
+class Tag(SQLModel, table=True):
+    __table_args__ = (UniqueConstraint("username", "name"),)
+
+    id: int | None = Field(default=None, primary_key=True)
+    name: str
+    username: str
+
+class TagCount(SQLModel):
+    name: str
+    count: int
+
 # Notes
 class NoteBase(SQLModel):
     title: str | None = Field(default=None)
     content: str | None = Field(default=None)
+    folder_id: int | None = Field(default=None, foreign_key="folder.id")
 
 class Note(NoteBase, table=True):
+    __table_args__ = (
+        Index("ix_note_username_folder_id", "username", "folder_id"),
+        Index("ix_note_username_updated_at", "username", "updated_at"),
+    )
+
     id: str | None = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
     username: str = Field(index=True)
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
+    updated_at: datetime | None = Field(default_factory=lambda: datetime.now(timezone.utc))
+    tags: list[Tag] = Relationship(link_model=NoteTag, sa_relationship_kwargs={"viewonly": True})
 
 class NoteCreate(NoteBase):
-    pass
+    tags: list[str] = []
 
 class NoteUpdate(NoteBase):
-    pass
+    tags: list[str] | None = None
 
 class NotePublic(NoteBase):
     id: str
     username: str
+    version: int
+    updated_at: datetime | None = None
+    tags: list[str] = []
+
+    @field_validator("tags", mode="before")
+    @classmethod
+    def tag_names(cls, value):
+        return sorted(getattr(tag, "name", tag) for tag in value)
+
+class NoteBatchGet(SQLModel):
+    ids: list[str] = Field(min_length=1, max_length=100)
+
+class NoteBatch(SQLModel):
+    notes: list[NotePublic]
+    missing: list[str]
+
+class TextEdit(SQLModel):
+    # Offsets count UTF-16 code units, matching JavaScript string indices
+    start: int = Field(ge=0)
+    end: int = Field(ge=0)
+    text: str = ""
+
+class NotePatch(SQLModel):
+    base_version: int
+    title: str | None = None
+    edits: list[TextEdit] | None = None
+    diff: str | None = None
+
+# Jobs
+class JobBase(SQLModel):
+    kind: str
+    status: str = Field(default="queued")
+    progress: float = Field(default=0.0)
+    attempts: int = Field(default=0)
+    max_attempts: int = Field(default=3)
+    error: str | None = Field(default=None)
+    result: dict | None = Field(default=None, sa_type=JSON)
+    created_by: str
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class Job(JobBase, table=True):
+    __table_args__ = (
+        Index("ix_job_status_run_after", "status", "run_after"),
+        Index("ix_job_created_by_created_at", "created_by", "created_at"),
+    )
+
+    id: str | None = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
+    payload: dict = Field(default_factory=dict, sa_type=JSON)
+    run_after: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class JobPublic(JobBase):
+    id: str
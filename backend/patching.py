@@ -0,0 +1,122 @@
+"""Apply text deltas (range edits or unified diffs) to note content."""
+import re
+
+from models import TextEdit
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class PatchError(ValueError):
+    """Raised when a patch does not apply cleanly to the base content."""
+
+
+def utf16_boundaries(content: str) -> dict[int, int] | None:
+    """
+    Map UTF-16 code unit offsets to string indices at every character boundary.
+    Returns None when the content has no characters outside the BMP, in which
+    case both offsets are the same.
+    """
+    if len(content.encode("utf-16-le")) == 2 * len(content):
+        return None
+    boundaries = {}
+    offset = 0
+    for index, char in enumerate(content):
+        boundaries[offset] = index
+        offset += 2 if ord(char) > 0xFFFF else 1
+    boundaries[offset] = len(content)
+    return boundaries
+
+
+def apply_edits(content: str, edits: list[TextEdit]) -> str:
+    """
+    Apply non-overlapping range replacements, all relative to the base content.
+    Offsets count UTF-16 code units, like JavaScript string indices.
+    """
+    boundaries = utf16_boundaries(content)
+    length = len(content) if boundaries is None else max(boundaries)
+
+    def to_index(offset: int) -> int:
+        if boundaries is None:
+            return offset
+        if offset not in boundaries:
+            raise PatchError(f"Offset {offset} splits a surrogate pair")
+        return boundaries[offset]
+
+    ordered = sorted(edits, key=lambda edit: (edit.start, edit.end))
+    pieces = []
+    cursor = 0
+    for edit in ordered:
+        if edit.start > edit.end or edit.end > length:
+            raise PatchError(f"Edit range {edit.start}-{edit.end} is outside the note content")
+        start, end = to_index(edit.start), to_index(edit.end)
+        if start < cursor:
+            raise PatchError("Edit ranges must not overlap")
+        pieces.append(content[cursor:start])
+        pieces.append(edit.text)
+        cursor = end
+    pieces.append(content[cursor:])
+    return "".join(pieces)
+
+
+def apply_unified_diff(content: str, diff: str) -> str:
+    """Apply a unified diff, verifying every context and removed line."""
+    # Only "\n" ends a line in a diff, unlike str.splitlines which also splits
+    # on form feeds, U+2028 and other separators
+    source = re.findall(r"[^\n]*\n|[^\n]+$", content)
+    output = []
+    cursor = 0
+    last_op = None
+    in_hunk = False
+
+    lines = diff.split("\n")
+    if lines[-1] == "":
+        lines.pop()
+    for line in lines:
+        header = HUNK_HEADER.match(line)
+        if header:
+            old_start = int(header.group(1))
+            old_count = int(header.group(2) or 1)
+            target = old_start if old_count == 0 else old_start - 1
+            if target < cursor or target > len(source):
+                raise PatchError(f"Hunk at line {old_start} is out of order or out of range")
+            output.extend(source[cursor:target])
+            cursor = target
+            in_hunk = True
+            continue
+        if not in_hunk:
+            # File headers ("--- a/...", "+++ b/...") precede the first hunk
+            continue
+        if line.startswith("\\"):
+            # "\ No newline at end of file" applies to the preceding line
+            if last_op == "+" and output:
+                output[-1] = output[-1].rstrip("\n")
+            continue
+
+        op, text = (line[0], line[1:]) if line else (" ", "")
+        if op in (" ", "-"):
+            if cursor >= len(source) or source[cursor].removesuffix("\n") != text:
+                raise PatchError(f"Diff does not match note content at line {cursor + 1}")
+            if op == " ":
+                output.append(source[cursor])
+            cursor += 1
+        elif op == "+":
+            output.append(text + "\n")
+        else:
+            raise PatchError(f"Unexpected diff line: {line!r}")
+        last_op = op
+
+    if not in_hunk:
+        raise PatchError("Diff contains no hunks")
+    output.extend(source[cursor:])
+    return "".join(output)
+
+
+def apply_patch(content: str | None, edits: list[TextEdit] | None = None, diff: str | None = None) -> str | None:
+    """Apply either range edits or a unified diff to the note content."""
+    if edits is not None and diff is not None:
+        raise PatchError("Provide either edits or diff, not both")
+    if edits is not None:
+        return apply_edits(content or "", edits)
+    if diff is not None:
+        return apply_unified_diff(content or "", diff)
+    return content
@@ -2,3 +2,5 @@
 from . import notes
 from . import users
 from . import authentication
+from . import jobs
+from . import frontend
@@ -7,12 +7,12 @@ import jwt
 from fastapi import Depends, APIRouter, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jwt.exceptions import InvalidTokenError
-from pwdlib import PasswordHash
 from sqlmodel import select, Session
 
 from models import User, Token, TokenData
 from database import SessionDep
 from limiter import limiter
+from hashing import password_hash
 
 load_dotenv()
 
@@ -21,29 +21,32 @@ SECRET_KEY =  os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 
 
-password_hash = PasswordHash.recommended()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 router = APIRouter()
 
-def verify_password(plain_password, hashed_password):
-    """Verify if plain password matches hash."""
-    return password_hash.verify(plain_password, hashed_password)
-
 def get_password_hash(password):
     """Generate secure hash for password."""
     return password_hash.hash(password)
 
 def get_user(session: Session, username: str):
-    """Retrieve user from DB by username."""
-    statement = select(User).where(User.username == username)
+    """Retrieve user from DB by username, ignoring users being deleted."""
+    statement = select(User).where(User.username == username).where(User.deleted == False)
     user = session.exec(statement).first()
     return user
 
 def authenticate_user(session: Session, username: str, password: str):
-    """Authenticate user with username and password."""
+    """Authenticate user with username and password, rehashing outdated hashes."""
     user = get_user(session, username)
-    if not user or not verify_password(password, user.password):
+    if not user:
+        return False
+    valid, updated_hash = password_hash.verify_and_update(password, user.password)
+    if not valid:
         return False
+    if updated_hash:
+        user.password = updated_hash
+        session.add(user)
+        session.commit()
+        session.refresh(user)
     return user
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
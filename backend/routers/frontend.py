@@ -0,0 +1,37 @@
+# routers/frontend.py
+
+from fastapi import APIRouter, HTTPException, Request, Response
+
+from static import frontend, choose_encoding
+
+router = APIRouter(include_in_schema=False)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+@router.api_route("/{name:path}", methods=["GET", "HEAD"])
+def serve_frontend(request: Request, name: str):
+    """
+    Serve a built frontend file in the best encoding the client accepts.
+    Hashed assets are cached forever; pages are revalidated with their ETag.
+    """
+    static_file = frontend.get(name)
+    if static_file is None:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    encoding = choose_encoding(static_file, request.headers.get("accept-encoding", ""))
+    etag = f'"{static_file.etag}-{encoding}"'
+    headers = {
+        "ETag": etag,
+        "Vary": "Accept-Encoding",
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if static_file.immutable else REVALIDATE_CACHE_CONTROL,
+    }
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=static_file.variants[encoding], media_type=static_file.content_type, headers=headers)
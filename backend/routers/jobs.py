@@ -0,0 +1,41 @@
+# routers/jobs.py
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import Annotated
+from sqlmodel import select
+
+from routers.authentication import get_current_user
+from models import User, Job, JobPublic
+from database import SessionDep
+
+router = APIRouter(tags=["jobs"])
+
+
+@router.get("/", response_description="List your recent jobs", response_model=list[JobPublic])
+def list_jobs(
+    session: SessionDep,
+    user: Annotated[User, Depends(get_current_user)],
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+):
+    """
+    Retrieve the most recent background jobs started by the authenticated user.
+    """
+    statement = (
+        select(Job)
+        .where(Job.created_by == user.username)
+        .order_by(Job.created_at.desc())
+        .limit(limit)
+    )
+    return session.exec(statement).all()
+
+
+@router.get("/{job_id}", response_description="Get job status and progress", response_model=JobPublic)
+def get_job(job_id: str, session: SessionDep, user: Annotated[User, Depends(get_current_user)]):
+    """
+    Retrieve the status and progress of a background job.
+    Only accessible to the user who started it or to admins.
+    """
+    job = session.get(Job, job_id)
+    if not job or (job.created_by != user.username and not user.admin_status):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -1,48 +1,209 @@
-from fastapi import APIRouter, HTTPException, Depends, Request
-from typing import Annotated
-from sqlmodel import select
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
+from fastapi.responses import StreamingResponse
+from typing import Annotated, Literal
+from limits import parse
+from slowapi.errors import RateLimitExceeded
+from slowapi.util import get_remote_address
+from slowapi.wrappers import Limit
+from sqlalchemy.orm import selectinload
+from sqlmodel import select, func, delete, Session
 
-from models import Note, NoteCreate, NoteUpdate, NotePublic, User
+from models import (
+    Note, NoteCreate, NoteUpdate, NotePatch, NotePublic, User,
+    Folder, FolderCreate, FolderPublic, Tag, NoteTag, TagCount, NoteBatchGet, NoteBatch,
+)
 from routers.authentication import get_current_user
 from database import SessionDep
 from limiter import limiter
+from coalescer import note_coalescer, StaleVersionError
+from cache import note_cache
+from patching import PatchError
 
 router = APIRouter()
 
+BATCH_GET_RATE_LIMIT = Limit(
+    parse("300/minute"), key_func=get_remote_address, scope="notes-batch-get", per_method=False,
+    methods=None, error_message=None, exempt_when=None, cost=1, override_defaults=False,
+)
+ADMIN_NOTES_MAX_PAGE = 10000
+ADMIN_NOTES_CHUNK_SIZE = 500
+
+NOTE_SORT_COLUMNS = {
+    "title": Note.title.asc(),
+    "-title": Note.title.desc(),
+    "updated": Note.updated_at.asc(),
+    "-updated": Note.updated_at.desc(),
+}
+
+def charge_batch(request: Request, items: int):
+    """
+    Charge one batch rate limit hit per requested note. Failures are raised
+    like the @limiter.limit decorator's, so slowapi's handler formats them.
+    """
+    if not limiter.enabled:
+        return
+    identifiers = [BATCH_GET_RATE_LIMIT.key_func(request), BATCH_GET_RATE_LIMIT.scope]
+    # Read by slowapi when it adds rate limit headers to the response
+    request.state.view_rate_limit = (BATCH_GET_RATE_LIMIT.limit, identifiers)
+    if not limiter.limiter.hit(BATCH_GET_RATE_LIMIT.limit, *identifiers, cost=items):
+        raise RateLimitExceeded(BATCH_GET_RATE_LIMIT)
+
+def check_folder(session: Session, username: str, folder_id: int | None):
+    """Ensure the folder exists and belongs to the user."""
+    if folder_id is None:
+        return
+    statement = select(Folder.id).where(Folder.id == folder_id).where(Folder.username == username)
+    if session.exec(statement).first() is None:
+        raise HTTPException(status_code=404, detail="Folder not found")
+
+def set_note_tags(session: Session, note: Note, names: list[str]):
+    """Replace the note's tags, creating any of the user's tags that do not exist yet."""
+    session.exec(delete(NoteTag).where(NoteTag.note_id == note.id))
+    names = sorted({name.strip() for name in names if name.strip()})
+    if not names:
+        return
+    statement = select(Tag).where(Tag.username == note.username).where(Tag.name.in_(names))
+    tags = {tag.name: tag for tag in session.exec(statement).all()}
+    for name in names:
+        if name not in tags:
+            tags[name] = Tag(name=name, username=note.username)
+            session.add(tags[name])
+    session.flush()
+    for tag in tags.values():
+        session.add(NoteTag(note_id=note.id, tag_id=tag.id, username=note.username))
+
 @router.post("/", response_description="Add new note", response_model=NotePublic)
 @limiter.limit("20/minute")
 def create_note(request: Request, note: NoteCreate, session: SessionDep, user: Annotated[User, Depends(get_current_user)]):
     """
     Create a new note for the currently authenticated user.
     """
-    db_note = Note.model_validate(note, update={"username": user.username})
+    check_folder(session, user.username, note.folder_id)
+    db_note = Note.model_validate(note.model_dump(exclude={"tags"}), update={"username": user.username})
     session.add(db_note)
+    set_note_tags(session, db_note, note.tags)
     session.commit()
     session.refresh(db_note)
+    note_cache.invalidate_user(user.username)
     return db_note
 
 @router.get("/", response_description="List all user notes", response_model=list[NotePublic])
 @limiter.limit("60/minute")
-def get_notes(request: Request, session: SessionDep, user: Annotated[User, Depends(get_current_user)]):
+def get_notes(
+    request: Request,
+    session: SessionDep,
+    user: Annotated[User, Depends(get_current_user)],
+    tag: str | None = None,
+    folder_id: int | None = None,
+    sort: Literal["title", "-title", "updated", "-updated"] | None = None,
+):
     """
-    Retrieve all notes belonging to the authenticated user.
+    Retrieve notes belonging to the authenticated user.
+    Optionally filter by tag name or folder and sort by title or last update.
     """
-    statement = select(Note).where(Note.username == user.username)
-    notes = session.exec(statement).all()
+    def load_notes():
+        note_coalescer.flush_user(session, user.username)
+        statement = select(Note).where(Note.username == user.username).options(selectinload(Note.tags))
+        if folder_id is not None:
+            statement = statement.where(Note.folder_id == folder_id)
+        if tag is not None:
+            tag_id = select(Tag.id).where(Tag.username == user.username).where(Tag.name == tag).scalar_subquery()
+            statement = statement.join(NoteTag, NoteTag.note_id == Note.id).where(
+                NoteTag.username == user.username, NoteTag.tag_id == tag_id
+            )
+        if sort is not None:
+            statement = statement.order_by(NOTE_SORT_COLUMNS[sort])
+        return [NotePublic.model_validate(note) for note in session.exec(statement).all()]
+
+    notes = note_cache.get_or_load(user.username, ("list", tag, folder_id, sort), load_notes)
     print("Listed all User Notes")
     return notes
 
-# @router.get("/admin/all-notes", response_description="List all notes", response_model=list[NotePublic])
-# def get_notes_all(session: SessionDep, admin: Annotated[User, Depends(get_current_user)]):
-#     """
-#     Retrieve all notes belonging to all users (admin only).
-#     """
-#     if not admin.admin_status:
-#         raise HTTPException(status_code=403, detail="Admin privileges required")
+@router.get("/tags", response_description="List tags with note counts", response_model=list[TagCount])
+@limiter.limit("60/minute")
+def get_tags(request: Request, session: SessionDep, user: Annotated[User, Depends(get_current_user)]):
+    """
+    List the authenticated user's tags with the number of notes carrying each.
+    """
+    statement = (
+        select(Tag.name, func.count(NoteTag.note_id))
+        .join(NoteTag, NoteTag.tag_id == Tag.id)
+        .where(NoteTag.username == user.username)
+        .group_by(Tag.id)
+        .order_by(Tag.name)
+    )
+    return [TagCount(name=name, count=count) for name, count in session.exec(statement).all()]
 
-#     notes = session.exec(select(Note)).all()
-#     print("Listed all notes")
-#     return notes
+@router.post("/folders", response_description="Create a folder", response_model=FolderPublic)
+@limiter.limit("20/minute")
+def create_folder(request: Request, folder: FolderCreate, session: SessionDep, user: Annotated[User, Depends(get_current_user)]):
+    """
+    Create a folder for the authenticated user.
+    """
+    statement = select(Folder).where(Folder.username == user.username).where(Folder.name == folder.name)
+    if session.exec(statement).first():
+        raise HTTPException(status_code=400, detail="Folder already exists")
+
+    db_folder = Folder.model_validate(folder, update={"username": user.username})
+    session.add(db_folder)
+    session.commit()
+    session.refresh(db_folder)
+    return FolderPublic(id=db_folder.id, name=db_folder.name)
+
+@router.get("/folders", response_description="List folders with note counts", response_model=list[FolderPublic])
+@limiter.limit("60/minute")
+def get_folders(request: Request, session: SessionDep, user: Annotated[User, Depends(get_current_user)]):
+    """
+    List the authenticated user's folders with the number of notes in each.
+    """
+    counts = dict(session.exec(
+        select(Note.folder_id, func.count(Note.id))
+        .where(Note.username == user.username)
+        .where(Note.folder_id.is_not(None))
+        .group_by(Note.folder_id)
+    ).all())
+    folders = session.exec(select(Folder).where(Folder.username == user.username).order_by(Folder.name)).all()
+    return [FolderPublic(id=folder.id, name=folder.name, note_count=counts.get(folder.id, 0)) for folder in folders]
+
+@router.get("/admin/all-notes", response_description="Stream all notes (admin only)", response_class=StreamingResponse)
+def get_notes_all(
+    session: SessionDep,
+    admin: Annotated[User, Depends(get_current_user)],
+    limit: Annotated[int, Query(ge=1, le=ADMIN_NOTES_MAX_PAGE)] = 1000,
+    after: str | None = None,
+):
+    """
+    Stream a page of notes from all users as newline-delimited JSON, ordered by ID (admin only).
+    Pass the `X-Next-Cursor` response header back as `after` to fetch the next page.
+    """
+    if not admin.admin_status:
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+
+    # Find the page boundary on the primary key index before streaming any rows
+    boundary = select(Note.id).order_by(Note.id).offset(limit - 1).limit(2)
+    if after is not None:
+        boundary = boundary.where(Note.id > after)
+    boundary_ids = session.exec(boundary).all()
+    last_id = boundary_ids[0] if boundary_ids else None
+
+    def stream_notes():
+        cursor = after
+        while True:
+            statement = select(Note).order_by(Note.id).limit(ADMIN_NOTES_CHUNK_SIZE).options(selectinload(Note.tags))
+            if cursor is not None:
+                statement = statement.where(Note.id > cursor)
+            if last_id is not None:
+                statement = statement.where(Note.id <= last_id)
+            notes = session.exec(statement).all()
+            for note in notes:
+                yield NotePublic.model_validate(note).model_dump_json() + "\n"
+            if len(notes) < ADMIN_NOTES_CHUNK_SIZE:
+                break
+            cursor = notes[-1].id
+
+    headers = {"X-Next-Cursor": last_id} if len(boundary_ids) > 1 else {}
+    print("Listed all notes")
+    return StreamingResponse(stream_notes(), media_type="application/x-ndjson", headers=headers)
 
 @router.get("/admin/count-notes", response_description="Count all notes", response_model=dict)
 def count_notes(session: SessionDep, admin: Annotated[User, Depends(get_current_user)]):
@@ -52,8 +213,40 @@ def count_notes(session: SessionDep, admin: Annotated[User, Depends(get_current_
     if not admin.admin_status:
         raise HTTPException(status_code=403, detail="Admin privileges required")
     
-    notes = session.exec(select(Note)).all()
-    return {"total_notes": len(notes)}
+    total_notes = session.exec(select(func.count(Note.id))).one()
+    return {"total_notes": total_notes}
+
+@router.get("/admin/cache-stats", response_description="Note read cache metrics", response_model=dict)
+def cache_stats(admin: Annotated[User, Depends(get_current_user)]):
+    """
+    Report hit ratio and memory usage of this process's note read cache (admin only).
+    """
+    if not admin.admin_status:
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return note_cache.stats()
+
+@router.post("/batch-get", response_description="Get several notes at once", response_model=NoteBatch)
+def get_notes_batch(request: Request, batch: NoteBatchGet, session: SessionDep, user: Annotated[User, Depends(get_current_user)]):
+    """
+    Retrieve several notes by ID in one request.
+    Only notes belonging to the authenticated user are returned; other IDs are reported as missing.
+    Each requested ID counts against the rate limit.
+    """
+    charge_batch(request, len(batch.ids))
+    note_ids = list(dict.fromkeys(batch.ids))
+    note_coalescer.flush_user(session, user.username)
+    statement = (
+        select(Note)
+        .where(Note.username == user.username)
+        .where(Note.id.in_(note_ids))
+        .options(selectinload(Note.tags))
+    )
+    found = {note.id: note for note in session.exec(statement).all()}
+    print("Got Notes batch")
+    return NoteBatch(
+        notes=[NotePublic.model_validate(found[note_id]) for note_id in note_ids if note_id in found],
+        missing=[note_id for note_id in note_ids if note_id not in found],
+    )
 
 @router.get("/{note_id}", response_description="Get a single note", response_model=NotePublic)
 @limiter.limit("30/minute")
@@ -62,11 +255,16 @@ def get_note(request: Request, note_id: str, session: SessionDep, user: Annotate
     Retrieve a specific note by its ID.
     Only accessible if the note belongs to the authenticated user.
     """
-    statement = select(Note).where(Note.id == note_id).where(Note.username == user.username)
-    note = session.exec(statement).first()
-    
-    if not note:
-        raise HTTPException(status_code=404, detail="Note not found")
+    def load_note():
+        note_coalescer.flush_note(session, note_id)
+        statement = select(Note).where(Note.id == note_id).where(Note.username == user.username)
+        note = session.exec(statement).first()
+
+        if not note:
+            raise HTTPException(status_code=404, detail="Note not found")
+        return NotePublic.model_validate(note)
+
+    note = note_cache.get_or_load(user.username, ("note", note_id), load_note)
     print("Got Note")
     return note
 
@@ -88,16 +286,52 @@ def update_note(
     if not db_note:
         raise HTTPException(status_code=404, detail="Note not found or not owned by user")
 
-    note_data = note.model_dump(exclude_unset=True)
-    db_note.sqlmodel_update(note_data)
-    
-    session.add(db_note)
-    session.commit()
-    session.refresh(db_note)
+    note_data = note.model_dump(exclude_unset=True, exclude={"tags"})
+    check_folder(session, user.username, note_data.get("folder_id"))
+    try:
+        note_coalescer.replace(session, db_note, note_data)
+    except StaleVersionError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if note.tags is not None:
+        set_note_tags(session, db_note, note.tags)
+        session.commit()
+        session.refresh(db_note)
+    note_cache.invalidate_user(user.username)
     
     print("Note updated")
     return db_note
 
+@router.patch("/{note_id}", response_description="Apply text edits to a note", response_model=NotePublic)
+@limiter.limit("60/minute")
+def patch_note(
+    request: Request,
+    note_id: str,
+    patch: NotePatch,
+    session: SessionDep,
+    user: Annotated[User, Depends(get_current_user)]
+):
+    """
+    Apply range edits or a unified diff to a note owned by the authenticated user.
+    The patch must be based on the current version of the note.
+    Rapid successive patches are coalesced into a single commit.
+    """
+    statement = select(Note).where(Note.id == note_id).where(Note.username == user.username)
+    db_note = session.exec(statement).first()
+
+    if not db_note:
+        raise HTTPException(status_code=404, detail="Note not found or not owned by user")
+
+    try:
+        note = note_coalescer.apply(session, db_note, patch)
+    except StaleVersionError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except PatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    note_cache.invalidate_user(user.username)
+
+    print("Note patched")
+    return note
+
 @router.delete("/{note_id}", response_description="Delete a note")
 @limiter.limit("30/minute")
 def delete_note(request: Request, note_id: str, session: SessionDep, user: Annotated[User, Depends(get_current_user)]):
@@ -110,8 +344,11 @@ def delete_note(request: Request, note_id: str, session: SessionDep, user: Annot
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
     
+    note_coalescer.discard_note(note_id)
+    session.exec(delete(NoteTag).where(NoteTag.note_id == note_id))
     session.delete(note)
     session.commit()
+    note_cache.invalidate_user(user.username)
     
     print("Note deleted")
     return {"message": "Note deleted successfully"}
@@ -1,16 +1,29 @@
 # routers/users.py
 
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, Query
 from typing import Annotated
-from sqlmodel import select
+from sqlalchemy import LargeBinary, cast
+from sqlmodel import select, delete, func, Session
 
 from routers.authentication import get_current_user, get_password_hash
-from models import User, UserCreate, UserPublic, Note
+from models import User, UserCreate, UserPublic, UserStats, Note, Tag, NoteTag, Folder
 from database import SessionDep
 from limiter import limiter
+from coalescer import note_coalescer
+from cache import note_cache
+from jobs import job_queue, JobContext
 
 router = APIRouter(tags=["users"])
 
+DELETE_BATCH_SIZE = 500
+
+
+def prefix_upper_bound(prefix: str) -> str | None:
+    """Smallest string greater than every string starting with prefix."""
+    if not prefix or ord(prefix[-1]) >= 0x10FFFF:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
 
 @router.post("/create-user", response_description="Create a new user", response_model=UserPublic)
 @limiter.limit("3/minute")
@@ -45,17 +58,61 @@ def get_user(user: Annotated[User, Depends(get_current_user)]):
     return user
 
 
-@router.get("/admin/list-all", response_description="List users (admin only)", response_model=list[UserPublic])
-def list_users(session: SessionDep, admin: Annotated[User, Depends(get_current_user)]):
+@router.get("/admin/list-all", response_description="List users (admin only)", response_model=list[UserStats])
+def list_users(
+    response: Response,
+    session: SessionDep,
+    admin: Annotated[User, Depends(get_current_user)],
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+    after: str | None = None,
+    prefix: str | None = None,
+):
     """
-    Retrieve a list of all registered users (admin only).
+    Retrieve a page of registered users ordered by username, with note statistics (admin only).
+    Pass the `X-Next-Cursor` response header back as `after` to fetch the next page.
+    Optionally restrict the listing to usernames starting with `prefix`.
     """
     if not admin.admin_status:
         raise HTTPException(status_code=403, detail="Admin privileges required")
 
-    users = session.exec(select(User)).all()
-    print("Listed all users")
-    return users
+    # Walk the unique username index: range predicates instead of LIKE keep it usable
+    page = select(User).where(User.deleted == False).order_by(User.username).limit(limit + 1)
+    if after is not None:
+        page = page.where(User.username > after)
+    if prefix:
+        page = page.where(User.username >= prefix)
+        upper = prefix_upper_bound(prefix)
+        if upper is not None:
+            page = page.where(User.username < upper)
+    page = page.subquery()
+
+    note_bytes = func.coalesce(func.length(cast(Note.title, LargeBinary)), 0) + func.coalesce(
+        func.length(cast(Note.content, LargeBinary)), 0
+    )
+    statement = (
+        select(
+            page.c.id,
+            page.c.username,
+            page.c.admin_status,
+            func.count(Note.id),
+            func.coalesce(func.sum(note_bytes), 0),
+        )
+        .select_from(page)
+        .outerjoin(Note, Note.username == page.c.username)
+        .group_by(page.c.id, page.c.username, page.c.admin_status)
+        .order_by(page.c.username)
+    )
+    rows = session.exec(statement).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = rows[-1][1]
+
+    print("Listed users")
+    return [
+        UserStats(id=id, username=username, admin_status=admin_status, note_count=note_count, storage_bytes=storage_bytes)
+        for id, username, admin_status, note_count, storage_bytes in rows
+    ]
 
 
 @router.get("/admin/count-users", response_description="Count all users", response_model=dict)
@@ -66,15 +123,16 @@ def count_users(session: SessionDep, admin: Annotated[User, Depends(get_current_
     if not admin.admin_status:
         raise HTTPException(status_code=403, detail="Admin privileges required")
     
-    users = session.exec(select(User)).all()
-    return {"total_users": len(users)}
+    total_users = session.exec(select(func.count(User.id)).where(User.deleted == False)).one()
+    return {"total_users": total_users}
 
 
-@router.delete("/admin/delete/{user_id}", response_description="Delete a user (admin only)")
+@router.delete("/admin/delete/{user_id}", status_code=202, response_description="Schedule deletion of a user (admin only)")
 def delete_user(user_id: int, session: SessionDep, admin: Annotated[User, Depends(get_current_user)]):
     """
-    Delete a user by ID and all their notes (admin only).
-    Cannot delete own account.
+    Schedule deletion of a user by ID and all their notes (admin only).
+    Cannot delete own account. The user can no longer sign in once this returns;
+    their data is removed by the background job whose ID is returned.
     """
     if not admin.admin_status:
         raise HTTPException(status_code=403, detail="Admin privileges required")
@@ -82,20 +140,48 @@ def delete_user(user_id: int, session: SessionDep, admin: Annotated[User, Depend
     if admin.id == user_id:
         raise HTTPException(status_code=400, detail="Cannot delete own account")    
     
-    statement = select(User).where(User.id == user_id)
+    statement = select(User).where(User.id == user_id).where(User.deleted == False)
     user_to_delete = session.exec(statement).first()
     
     if not user_to_delete:
         raise HTTPException(status_code=404, detail="User not found")
-        
-    # Delete all notes associated with this user
-    notes_statement = select(Note).where(Note.username == user_to_delete.username)
-    user_notes = session.exec(notes_statement).all()
-    for note in user_notes:
-        session.delete(note)
+
+    user_to_delete.deleted = True
+    session.add(user_to_delete)
+    session.commit()
+    note_coalescer.discard_user(user_to_delete.username)
+    job = job_queue.enqueue(session, "delete_user", {"user_id": user_id}, created_by=admin.username)
     
+    print(f"Deletion of user {user_id} scheduled by admin {admin.username} as job {job.id}")
+    return {"message": "User deletion scheduled", "job_id": job.id}
+
+
+@job_queue.handler("delete_user")
+def delete_user_job(session: Session, payload: dict, context: JobContext):
+    """Delete a user, their notes, tags and folders in batches."""
+    user_to_delete = session.get(User, payload["user_id"])
+    if not user_to_delete:
+        return {"deleted_notes": 0}
+    username = user_to_delete.username
+    note_coalescer.discard_user(username)
+
+    total = session.exec(select(func.count(Note.id)).where(Note.username == username)).one()
+    deleted = 0
+    while True:
+        note_ids = session.exec(select(Note.id).where(Note.username == username).limit(DELETE_BATCH_SIZE)).all()
+        if not note_ids:
+            break
+        session.exec(delete(NoteTag).where(NoteTag.note_id.in_(note_ids)))
+        session.exec(delete(Note).where(Note.id.in_(note_ids)))
+        deleted += len(note_ids)
+        context.report(deleted / (total + 1))
+
+    session.exec(delete(NoteTag).where(NoteTag.username == username))
+    session.exec(delete(Tag).where(Tag.username == username))
+    session.exec(delete(Folder).where(Folder.username == username))
     session.delete(user_to_delete)
     session.commit()
-    
-    print(f"User {user_id} and their {len(user_notes)} notes deleted by admin {admin.username}")
-    return {"message": f"User and {len(user_notes)} notes deleted successfully"}
\ No newline at end of file
+    note_cache.invalidate_user(username)
+
+    print(f"User {username} and their {deleted} notes deleted")
+    return {"deleted_notes": deleted}
@@ -0,0 +1,133 @@
+"""Build the frontend into hashed, precompressed assets held in memory."""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+load_dotenv()
+
+SERVE_FRONTEND = os.getenv("SERVE_FRONTEND", "").lower() in ("1", "true", "yes")
+FRONTEND_DIR = Path(os.getenv("FRONTEND_DIR", Path(__file__).resolve().parent.parent / "frontend"))
+FRONTEND_INDEX = "login.html"
+
+INLINE_SCRIPT = re.compile(r"<script>(.*?)</script>", re.DOTALL)
+INLINE_STYLE = re.compile(r"<style>(.*?)</style>", re.DOTALL)
+# The standalone frontend talks to a fixed API host; bundled pages use the origin serving them
+API_BASE_ASSIGNMENT = re.compile(r"(\bconst API_BASE = )(\"[^\"]*\"|'[^']*')")
+
+# Smaller payloads are not worth the compression framing overhead
+MIN_COMPRESS_BYTES = 256
+
+
+@dataclass
+class StaticFile:
+    content_type: str
+    etag: str
+    immutable: bool
+    # Encoding ("identity", "br", "gzip") to body
+    variants: dict[str, bytes] = field(default_factory=dict)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_static_file(data: bytes, content_type: str, immutable: bool) -> StaticFile:
+    """Store the file with every compressed variant that is actually smaller."""
+    static_file = StaticFile(content_type=content_type, etag=content_hash(data)[:32], immutable=immutable)
+    static_file.variants["identity"] = data
+    if len(data) >= MIN_COMPRESS_BYTES:
+        if brotli is not None:
+            compressed = brotli.compress(data, quality=11)
+            if len(compressed) < len(data):
+                static_file.variants["br"] = compressed
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(compressed) < len(data):
+            static_file.variants["gzip"] = compressed
+    return static_file
+
+
+class FrontendBundle:
+    """
+    In-memory build of the frontend pages.
+
+    Inline <style> and <script> blocks are moved into assets named after
+    their content hash, so they can be cached forever, while the much
+    smaller HTML pages are revalidated with ETags. Scripts call the API on
+    the origin that serves them.
+    """
+
+    def __init__(self, source_dir: Path = FRONTEND_DIR):
+        self.source_dir = Path(source_dir)
+        self.files: dict[str, StaticFile] = {}
+
+    def build(self):
+        pages = sorted(self.source_dir.glob("*.html"))
+        if not pages:
+            raise RuntimeError(
+                f"No frontend pages found in {self.source_dir}; set FRONTEND_DIR to the frontend directory"
+            )
+        files = {}
+
+        def extract(page: str, extension: str, content_type: str, make_tag):
+            def replace(match: re.Match) -> str:
+                data = match.group(1).encode()
+                name = f"assets/{page}.{content_hash(data)[:12]}{extension}"
+                files[name] = make_static_file(data, content_type, immutable=True)
+                return make_tag(name)
+            return replace
+
+        for path in pages:
+            page = path.stem
+            html = path.read_text(encoding="utf-8")
+            html = API_BASE_ASSIGNMENT.sub(r"\1window.location.origin", html)
+            html = INLINE_STYLE.sub(
+                extract(page, ".css", "text/css; charset=utf-8",
+                        lambda name: f'<link rel="stylesheet" href="{name}" />'),
+                html,
+            )
+            html = INLINE_SCRIPT.sub(
+                extract(page, ".js", "text/javascript; charset=utf-8",
+                        lambda name: f'<script src="{name}"></script>'),
+                html,
+            )
+            files[path.name] = make_static_file(html.encode(), "text/html; charset=utf-8", immutable=False)
+
+        for path in sorted(self.source_dir.rglob("*")):
+            name = path.relative_to(self.source_dir).as_posix()
+            if path.is_file() and path.suffix != ".html" and name not in files and path.name != "Dockerfile":
+                content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+                files[name] = make_static_file(path.read_bytes(), content_type, immutable=False)
+
+        self.files = files
+        print(f"Built frontend: {len(files)} files from {self.source_dir}")
+
+    def get(self, name: str) -> StaticFile | None:
+        return self.files.get(name or FRONTEND_INDEX)
+
+
+def choose_encoding(static_file: StaticFile, accept_encoding: str) -> str:
+    """Pick the smallest variant the client accepts."""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip().lower())
+    for encoding in ("br", "gzip"):
+        if encoding in static_file.variants and (encoding in accepted or "*" in accepted):
+            return encoding
+    return "identity"
+
+
+frontend = FrontendBundle()
@@ -1,4 +1,10 @@
 """Pytest fixtures for testing."""
+import os
+
+# Cheap Argon2 parameters so per-test password hashing stays fast
+os.environ.setdefault("PASSWORD_HASH_PROFILE", "test")
+os.environ.setdefault("PASSWORD_HASH_ALLOW_TEST_PROFILE", "1")
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlmodel import Session, SQLModel, create_engine
@@ -8,6 +14,8 @@ from main import app
 from database import get_session
 from models import User, Note
 from routers.authentication import get_password_hash
+from coalescer import note_coalescer
+from cache import note_cache
 
 
 @pytest.fixture(name="session")
@@ -40,6 +48,8 @@ def client_fixture(session: Session):
     # Re-enable rate limiting after tests
     app.state.limiter.enabled = True
     app.dependency_overrides.clear()
+    note_coalescer.clear()
+    note_cache.clear()
 
 
 @pytest.fixture(name="test_user")
@@ -1,7 +1,9 @@
 """Tests for authentication endpoints."""
 import pytest
 from fastapi.testclient import TestClient
+from sqlmodel import Session
 from models import User
+from hashing import HashingProfile, build_password_hash, calibrate, get_profile, password_hash
 
 
 def test_login_success(client: TestClient, test_user: User):
@@ -53,3 +55,61 @@ def test_protected_route_with_valid_token(client: TestClient, auth_headers: dict
     """Test accessing protected route with valid token."""
     response = client.get("/user/", headers=auth_headers)
     assert response.status_code == 200
+
+
+def test_login_rehashes_outdated_password(client: TestClient, session: Session):
+    """Test login transparently upgrades hashes made with other parameters."""
+    old_hash = build_password_hash(HashingProfile(memory_cost=16, time_cost=2, parallelism=1)).hash("oldpass123")
+    user = User(username="legacy", password=old_hash)
+    session.add(user)
+    session.commit()
+
+    response = client.post("/token", data={"username": "legacy", "password": "oldpass123"})
+    assert response.status_code == 200
+
+    session.refresh(user)
+    assert user.password != old_hash
+    assert not password_hash.current_hasher.check_needs_rehash(user.password)
+
+    # The upgraded hash still verifies
+    response = client.post("/token", data={"username": "legacy", "password": "oldpass123"})
+    assert response.status_code == 200
+
+
+def test_login_keeps_current_hash(client: TestClient, session: Session, test_user: User):
+    """Test login leaves hashes with current parameters untouched."""
+    original_hash = test_user.password
+    response = client.post("/token", data={"username": "testuser", "password": "testpass123"})
+    assert response.status_code == 200
+    session.refresh(test_user)
+    assert test_user.password == original_hash
+
+
+def test_get_profile_overrides(monkeypatch):
+    """Test profile selection and per-parameter overrides from the environment."""
+    monkeypatch.setenv("PASSWORD_HASH_PROFILE", "low-memory")
+    monkeypatch.setenv("PASSWORD_HASH_TIME_COST", "5")
+    assert get_profile() == HashingProfile(memory_cost=19456, time_cost=5, parallelism=1)
+
+    monkeypatch.setenv("PASSWORD_HASH_PROFILE", "unknown")
+    with pytest.raises(ValueError):
+        get_profile()
+
+
+def test_calibrate_respects_target():
+    """Test calibration never exceeds the memory or pass limits it was given."""
+    profile = calibrate(target_ms=1000, memory_cost=64, parallelism=1, max_time_cost=3)
+    assert profile.memory_cost <= 64
+    assert 1 <= profile.time_cost <= 3
+    assert profile.parallelism == 1
+
+
+def test_test_profile_requires_flag(monkeypatch):
+    """Test the insecure test profile cannot be selected by accident."""
+    monkeypatch.setenv("PASSWORD_HASH_PROFILE", "test")
+    monkeypatch.delenv("PASSWORD_HASH_ALLOW_TEST_PROFILE")
+    with pytest.raises(ValueError):
+        get_profile()
+
+    monkeypatch.setenv("PASSWORD_HASH_ALLOW_TEST_PROFILE", "1")
+    assert get_profile() == HashingProfile(memory_cost=8, time_cost=1, parallelism=1)
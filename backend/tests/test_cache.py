@@ -0,0 +1,138 @@
+"""Tests for the note read cache."""
+import threading
+import pytest
+from models import NotePublic
+from cache import NoteReadCache, estimate_size
+
+
+def make_note(note_id: str, content: str = "") -> NotePublic:
+    return NotePublic(id=note_id, username="testuser", version=1, title=None, content=content)
+
+
+def test_cache_hit_after_miss():
+    """Test a loaded value is served from the cache afterwards."""
+    cache = NoteReadCache()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return make_note("a")
+
+    assert cache.get_or_load("testuser", ("note", "a"), loader).id == "a"
+    assert cache.get_or_load("testuser", ("note", "a"), loader).id == "a"
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_cache_invalidate_user():
+    """Test invalidation drops only the given user's entries."""
+    cache = NoteReadCache()
+    cache.get_or_load("testuser", ("note", "a"), lambda: make_note("a"))
+    cache.get_or_load("otheruser", ("note", "b"), lambda: make_note("b"))
+
+    cache.invalidate_user("testuser")
+
+    assert cache.get_or_load("testuser", ("note", "a"), lambda: make_note("a", "fresh")).content == "fresh"
+    assert cache.get_or_load("otheruser", ("note", "b"), lambda: make_note("b", "fresh")).content == ""
+
+
+def test_cache_evicts_least_recently_used():
+    """Test the byte budget evicts the least recently used entries."""
+    entry_size = estimate_size(make_note("a", "x" * 100))
+    cache = NoteReadCache(max_bytes=entry_size * 2)
+    for note_id in ["a", "b"]:
+        cache.get_or_load("testuser", ("note", note_id), lambda: make_note(note_id, "x" * 100))
+    cache.get_or_load("testuser", ("note", "a"), lambda: make_note("a"))  # touch a
+    cache.get_or_load("testuser", ("note", "c"), lambda: make_note("c", "x" * 100))
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2
+    assert stats["bytes"] <= stats["max_bytes"]
+    assert cache.get_or_load("testuser", ("note", "b"), lambda: make_note("b", "reloaded")).content == "reloaded"
+
+
+def test_cache_coalesces_concurrent_misses():
+    """Test concurrent misses for one key share a single load."""
+    cache = NoteReadCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return make_note("a", "loaded")
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_load("testuser", ("note", "a"), loader)))
+    leader.start()
+    started.wait(5)
+    followers = [
+        threading.Thread(target=lambda: results.append(cache.get_or_load("testuser", ("note", "a"), loader)))
+        for _ in range(3)
+    ]
+    for thread in followers:
+        thread.start()
+    while cache.stats()["coalesced"] < 3:
+        release.wait(0.01)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert [note.content for note in results] == ["loaded"] * 4
+    assert cache.stats()["coalesced"] == 3
+
+
+def test_cache_does_not_keep_errors():
+    """Test failures are not cached."""
+    cache = NoteReadCache()
+
+    def failing():
+        raise LookupError("missing")
+
+    with pytest.raises(LookupError):
+        cache.get_or_load("testuser", ("note", "a"), failing)
+    assert cache.get_or_load("testuser", ("note", "a"), lambda: make_note("a")).id == "a"
+
+
+def test_cache_skips_results_raced_by_write():
+    """Test a load overlapping an invalidation is returned but not cached."""
+    cache = NoteReadCache()
+
+    def loader():
+        cache.invalidate_user("testuser")
+        return make_note("a", "stale")
+
+    assert cache.get_or_load("testuser", ("note", "a"), loader).content == "stale"
+    assert cache.get_or_load("testuser", ("note", "a"), lambda: make_note("a", "fresh")).content == "fresh"
+
+
+def test_cache_invalidation_keeps_no_per_user_state():
+    """Test invalidating many users leaves no bookkeeping behind."""
+    cache = NoteReadCache()
+    for i in range(100):
+        username = f"user{i}"
+        cache.get_or_load(username, ("note", "a"), lambda: make_note("a"))
+        cache.invalidate_user(username)
+        cache.invalidate_user(f"writer{i}")
+
+    assert cache.stats()["entries"] == 0
+    assert (cache._entries, cache._user_keys, cache._inflight) == ({}, {}, {})
+
+
+def test_cache_detached_load_does_not_overwrite_newer_load():
+    """Test a load detached by a write does not cache over a load started after it."""
+    cache = NoteReadCache()
+
+    def stale_loader():
+        cache.invalidate_user("testuser")
+        assert cache.get_or_load("testuser", ("note", "a"), lambda: make_note("a", "fresh")).content == "fresh"
+        return make_note("a", "stale")
+
+    assert cache.get_or_load("testuser", ("note", "a"), stale_loader).content == "stale"
+    assert cache.get_or_load("testuser", ("note", "a"), lambda: make_note("a", "reloaded")).content == "fresh"
@@ -0,0 +1,135 @@
+"""Tests for serving the built frontend."""
+import gzip
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import frontend as frontend_router
+from static import FrontendBundle, FRONTEND_DIR
+
+SCRIPT = "console.log('hello from the notes app');\n" * 20
+STYLE = "body { font-family: sans-serif; margin: 0 auto; }\n" * 20
+
+
+@pytest.fixture(name="bundle")
+def bundle_fixture(tmp_path):
+    """Build a bundle from a small frontend with inline assets."""
+    (tmp_path / "login.html").write_text(
+        f"<html><head><style>{STYLE}</style></head><body><script>{SCRIPT}</script></body></html>"
+    )
+    (tmp_path / "notes.html").write_text("<html><body>Notes</body></html>")
+    bundle = FrontendBundle(tmp_path)
+    bundle.build()
+    return bundle
+
+
+@pytest.fixture(name="static_client")
+def static_client_fixture(bundle: FrontendBundle, monkeypatch):
+    """Serve the bundle under /app on a bare app."""
+    monkeypatch.setattr(frontend_router, "frontend", bundle)
+    app = FastAPI()
+    app.include_router(frontend_router.router, prefix="/app")
+    return TestClient(app)
+
+
+def asset_names(bundle: FrontendBundle, extension: str) -> list[str]:
+    return [name for name in bundle.files if name.startswith("assets/") and name.endswith(extension)]
+
+
+def test_build_extracts_inline_assets(bundle: FrontendBundle):
+    """Test inline styles and scripts become hashed asset files."""
+    [script] = asset_names(bundle, ".js")
+    [style] = asset_names(bundle, ".css")
+    html = bundle.get("login.html").variants["identity"].decode()
+    assert f'<script src="{script}"></script>' in html
+    assert f'<link rel="stylesheet" href="{style}" />' in html
+    assert SCRIPT not in html
+    assert bundle.get(script).variants["identity"].decode() == SCRIPT
+
+
+def test_build_real_frontend():
+    """Test the shipped frontend pages build without inline scripts."""
+    bundle = FrontendBundle(FRONTEND_DIR)
+    bundle.build()
+    for page in ["login.html", "notes.html", "note.html", "profile.html"]:
+        html = bundle.get(page).variants["identity"].decode()
+        assert "<script>" not in html
+        assert "<style>" not in html
+    assert "Dockerfile" not in bundle.files
+    for script in asset_names(bundle, ".js"):
+        code = bundle.get(script).variants["identity"].decode()
+        assert "const API_BASE = window.location.origin;" in code
+        assert "127.0.0.1" not in code
+
+
+def test_build_points_api_base_at_serving_origin(tmp_path):
+    """Test the hardcoded API host is replaced by the origin serving the page."""
+    (tmp_path / "login.html").write_text(
+        '<html><body><script>const API_BASE = "http://127.0.0.1:8000";\nfetch(`${API_BASE}/user`);</script></body></html>'
+    )
+    bundle = FrontendBundle(tmp_path)
+    bundle.build()
+    [script] = asset_names(bundle, ".js")
+    assert bundle.get(script).variants["identity"].decode() == (
+        "const API_BASE = window.location.origin;\nfetch(`${API_BASE}/user`);"
+    )
+
+
+def test_serve_hashed_asset_immutable(static_client: TestClient, bundle: FrontendBundle):
+    """Test hashed assets are served precompressed with long-lived caching."""
+    [script] = asset_names(bundle, ".js")
+    response = static_client.get(f"/app/{script}", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "immutable" in response.headers["cache-control"]
+    assert response.headers["content-type"].startswith("text/javascript")
+    assert response.text == SCRIPT
+    assert int(response.headers["content-length"]) == len(gzip.compress(SCRIPT.encode(), 9, mtime=0))
+
+
+def test_serve_brotli_when_accepted(static_client: TestClient, bundle: FrontendBundle):
+    """Test brotli is preferred when the client accepts it."""
+    pytest.importorskip("brotli")
+    [style] = asset_names(bundle, ".css")
+    response = static_client.get(f"/app/{style}", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+
+    response = static_client.get(f"/app/{style}", headers={"Accept-Encoding": "br;q=0, gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+
+
+def test_serve_identity_without_accept_encoding(static_client: TestClient, bundle: FrontendBundle):
+    """Test clients that accept no compression get the raw file."""
+    [script] = asset_names(bundle, ".js")
+    response = static_client.get(f"/app/{script}", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.text == SCRIPT
+
+
+def test_serve_html_with_etag(static_client: TestClient):
+    """Test pages are revalidated with ETags and the index is the login page."""
+    response = static_client.get("/app/", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-cache"
+    assert "<script src=" in response.text
+    etag = response.headers["etag"]
+
+    response = static_client.get("/app/", headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = static_client.get("/app/notes.html", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+
+def test_serve_missing_file(static_client: TestClient):
+    """Test unknown paths return 404."""
+    assert static_client.get("/app/missing.html").status_code == 404
+
+
+def test_build_fails_without_pages(tmp_path):
+    """Test a missing or empty frontend directory fails loudly instead of serving 404s."""
+    with pytest.raises(RuntimeError):
+        FrontendBundle(tmp_path / "missing").build()
+    with pytest.raises(RuntimeError):
+        FrontendBundle(tmp_path).build()
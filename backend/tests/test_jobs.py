@@ -0,0 +1,138 @@
+"""Tests for the background job queue and job endpoints."""
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from models import User, Job
+from jobs import JobQueue
+
+
+@pytest.fixture(name="queue")
+def queue_fixture():
+    """Create a job queue with test handlers registered."""
+    queue = JobQueue(workers=1, retry_delay=0)
+    calls = []
+
+    @queue.handler("count")
+    def count(session, payload, context):
+        for i in range(payload["steps"]):
+            context.report((i + 1) / payload["steps"])
+        return {"steps": payload["steps"]}
+
+    @queue.handler("flaky")
+    def flaky(session, payload, context):
+        calls.append(payload)
+        if len(calls) < payload["fail_times"] + 1:
+            raise RuntimeError("temporary failure")
+        return {"calls": len(calls)}
+
+    return queue
+
+
+def test_run_job_success(session: Session, queue: JobQueue):
+    """Test a queued job runs to completion."""
+    job = queue.enqueue(session, "count", {"steps": 3}, created_by="testuser")
+    assert job.status == "queued"
+
+    assert queue.run_next(session)
+    session.refresh(job)
+    assert job.status == "succeeded"
+    assert job.progress == 1.0
+    assert job.attempts == 1
+    assert job.result == {"steps": 3}
+
+    assert not queue.run_next(session)
+
+
+def test_run_job_retries_then_succeeds(session: Session, queue: JobQueue):
+    """Test a failing job is retried until it succeeds."""
+    job = queue.enqueue(session, "flaky", {"fail_times": 1}, created_by="testuser")
+
+    assert queue.run_next(session)
+    session.refresh(job)
+    assert job.status == "queued"
+    assert job.error == "temporary failure"
+
+    assert queue.run_next(session)
+    session.refresh(job)
+    assert job.status == "succeeded"
+    assert job.attempts == 2
+    assert job.error is None
+
+
+def test_run_job_fails_after_max_attempts(session: Session, queue: JobQueue):
+    """Test a job that keeps failing is marked failed."""
+    job = queue.enqueue(session, "flaky", {"fail_times": 5}, created_by="testuser", max_attempts=2)
+
+    while queue.run_next(session):
+        pass
+    session.refresh(job)
+    assert job.status == "failed"
+    assert job.attempts == 2
+
+
+def test_start_requeues_interrupted_jobs(session: Session, queue: JobQueue):
+    """Test jobs left running by a crash are requeued only while they have attempts left."""
+    retry = Job(kind="count", created_by="testuser", status="running", attempts=1, max_attempts=3)
+    exhausted = Job(kind="count", created_by="testuser", status="running", attempts=3, max_attempts=3)
+    session.add(retry)
+    session.add(exhausted)
+    session.commit()
+
+    queue.workers = 0
+    queue.start(session.get_bind())
+    queue.stop()
+
+    session.refresh(retry)
+    session.refresh(exhausted)
+    assert retry.status == "queued"
+    assert exhausted.status == "failed"
+    assert exhausted.error == "Interrupted on its last attempt"
+
+
+def test_enqueue_unknown_kind(session: Session, queue: JobQueue):
+    """Test enqueueing a job without a handler is rejected."""
+    with pytest.raises(ValueError):
+        queue.enqueue(session, "missing", {}, created_by="testuser")
+
+
+def test_worker_threads_run_jobs(session: Session, queue: JobQueue):
+    """Test started workers pick up queued jobs."""
+    engine = session.get_bind()
+    queue.poll_interval = 0.01
+    job = queue.enqueue(session, "count", {"steps": 1}, created_by="testuser")
+    queue.start(engine)
+    try:
+        for _ in range(500):
+            session.refresh(job)
+            if job.status == "succeeded":
+                break
+            queue._stopping.wait(0.01)
+    finally:
+        queue.stop()
+    assert job.status == "succeeded"
+
+
+def test_get_job_status(client: TestClient, auth_headers: dict, session: Session, test_user: User):
+    """Test users can see their own jobs."""
+    job = Job(kind="count", created_by=test_user.username)
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+
+    response = client.get(f"/jobs/{job.id}", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["status"] == "queued"
+
+    response = client.get("/jobs/", headers=auth_headers)
+    assert [j["id"] for j in response.json()] == [job.id]
+
+
+def test_get_other_user_job(client: TestClient, auth_headers: dict, session: Session):
+    """Test users cannot see jobs started by others."""
+    job = Job(kind="count", created_by="otheruser")
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+
+    response = client.get(f"/jobs/{job.id}", headers=auth_headers)
+    assert response.status_code == 404
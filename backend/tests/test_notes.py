@@ -1,9 +1,15 @@
 """Tests for note endpoints."""
 import pytest
+import json
 import re
+import threading
 from fastapi.testclient import TestClient
-from models import User, Note
-from sqlmodel import Session
+from models import User, Note, Folder, Tag, NoteTag, NotePatch, TextEdit
+from sqlmodel import Session, update
+from coalescer import note_coalescer, StaleVersionError
+from cache import note_cache
+from routers import notes as notes_router
+from main import app
 
 UUID_PATTERN = r'^[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}$'
 
@@ -153,3 +159,495 @@ def test_count_notes_as_regular_user(client: TestClient, auth_headers: dict):
     """Test regular user cannot count all notes."""
     response = client.get("/notes/admin/count-notes", headers=auth_headers)
     assert response.status_code == 403
+
+
+def test_update_note_bumps_version(client: TestClient, auth_headers: dict, session: Session, test_user: User):
+    """Test full updates advance the note version."""
+    note = Note(title="Original", content="Original content", username=test_user.username)
+    session.add(note)
+    session.commit()
+    session.refresh(note)
+    assert note.version == 1
+
+    response = client.put(f"/notes/{note.id}", json={"content": "New"}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+
+
+def test_patch_note_with_edits(client: TestClient, auth_headers: dict, session: Session, test_user: User):
+    """Test patching a note with range edits."""
+    note = Note(title="Draft", content="Hello world", username=test_user.username)
+    session.add(note)
+    session.commit()
+    session.refresh(note)
+
+    response = client.patch(f"/notes/{note.id}", json={
+        "base_version": 1,
+        "edits": [
+            {"start": 0, "end": 5, "text": "Goodbye"},
+            {"start": 11, "end": 11, "text": "!"}
+        ]
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["content"] == "Goodbye world!"
+    assert data["title"] == "Draft"
+    assert data["version"] == 2
+
+
+def test_patch_note_with_unified_diff(client: TestClient, auth_headers: dict, session: Session, test_user: User):
+    """Test patching a note with a unified diff."""
+    note = Note(title="List", content="one\ntwo\nthree\n", username=test_user.username)
+    session.add(note)
+    session.commit()
+    session.refresh(note)
+
+    diff = "--- a\n+++ b\n@@ -1,3 +1,3 @@\n one\n-two\n+TWO\n three\n"
+    response = client.patch(f"/notes/{note.id}", json={
+        "base_version": 1,
+        "title": "Shouting list",
+        "diff": diff
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["content"] == "one\nTWO\nthree\n"
+    assert data["title"] == "Shouting list"
+
+
+def test_patch_note_with_unified_diff_line_separators(client: TestClient, auth_headers: dict, session: Session, test_user: User):
+    """Test only newlines split lines, not form feeds or Unicode line separators."""
+    note = Note(title="List", content="a\fb\nc\u2028d\ne\n", username=test_user.username)
+    session.add(note)
+    session.commit()
+    session.refresh(note)
+
+    diff = "@@ -1,3 +1,3 @@\n a\fb\n-c\u2028d\n+C\u2028D\n e\n"
+    response = client.patch(f"/notes/{note.id}", json={"base_version": 1, "diff": diff}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["content"] == "a\fb\nC\u2028D\ne\n"
+
+
+def test_patch_note_mismatched_diff(client: TestClient, auth_headers: dict, session: Session, test_user: User):
+    """Test a diff whose context does not match is rejected."""
+    note = Note(title="List", content="one\ntwo\n", username=test_user.username)
+    session.add(note)
+    session.commit()
+    session.refresh(note)
+
+    diff = "@@ -1,2 +1,2 @@\n one\n-zwei\n+TWO\n"
+    response = client.patch(f"/notes/{note.id}", json={"base_version": 1, "diff": diff}, headers=auth_headers)
+    assert response.status_code == 422
+
+
+def test_patch_note_invalid_range(client: TestClient, auth_headers: dict, session: Session, test_user: User):
+    """Test edits outside the note content are rejected."""
+    note = Note(title="Short", content="abc", username=test_user.username)
+    session.add(note)
+    session.commit()
+    session.refresh(note)
+
+    response = client.patch(f"/notes/{note.id}", json={
+        "base_version": 1,
+        "edits": [{"start": 2, "end": 10, "text": "x"}]
+    }, headers=auth_headers)
+    assert response.status_code == 422
+
+
+def test_patch_note_stale_base(client: TestClient, auth_headers: dict, session: Session, test_user: User):
+    """Test patching against an outdated version returns a conflict."""
+    note = Note(title="Draft", content="abc", username=test_user.username)
+    session.add(note)
+    session.commit()
+    session.refresh(note)
+
+    first = client.patch(f"/notes/{note.id}", json={
+        "base_version": 1,
+        "edits": [{"start": 3, "end": 3, "text": "d"}]
+    }, headers=auth_headers)
+    assert first.status_code == 200
+
+    stale = client.patch(f"/notes/{note.id}", json={
+        "base_version": 1,
+        "edits": [{"start": 0, "end": 0, "text": "z"}]
+    }, headers=auth_headers)
+    assert stale.status_code == 409
+
+
+def test_patch_other_user_note(client: TestClient, auth_headers: dict, session: Session):
+    """Test user cannot patch another user's note."""
+    other_note = Note(title="Other Note", content="Content", username="otheruser")
+    session.add(other_note)
+    session.commit()
+    session.refresh(other_note)
+
+    response = client.patch(f"/notes/{other_note.id}", json={"base_version": 1, "title": "Mine"}, headers=auth_headers)
+    assert response.status_code == 404
+
+
+def test_patch_note_coalesces_rapid_saves(
+    client: TestClient, auth_headers: dict, session: Session, test_user: User, monkeypatch
+):
+    """Test rapid successive patches are held back and flushed together on read."""
+    monkeypatch.setattr(note_coalescer, "window", 60)
+    note = Note(title="Draft", content="", username=test_user.username)
+    session.add(note)
+    session.commit()
+    session.refresh(note)
+
+    for version, char in enumerate("abc", start=1):
+        response = client.patch(f"/notes/{note.id}", json={
+            "base_version": version,
+            "edits": [{"start": version - 1, "end": version - 1, "text": char}]
+        }, headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json()["version"] == version + 1
+
+    # Only the first patch has been committed so far
+    session.refresh(note)
+    assert note.content == "a"
+    assert note.version == 2
+
+    response = client.get(f"/notes/{note.id}", headers=auth_headers)
+    assert response.json()["content"] == "abc"
+    assert response.json()["version"] == 4
+    session.refresh(note)
+    assert note.content == "abc"
+
+
+def test_create_note_with_tags_and_folder(client: TestClient, auth_headers: dict):
+    """Test creating a note with tags inside a folder."""
+    folder = client.post("/notes/folders", json={"name": "Work"}, headers=auth_headers).json()
+
+    response = client.post("/notes/", json={
+        "title": "Standup",
+        "content": "Notes",
+        "folder_id": folder["id"],
+        "tags": ["meeting", "daily", "meeting"]
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["folder_id"] == folder["id"]
+    assert data["tags"] == ["daily", "meeting"]
+
+
+def test_create_note_in_other_user_folder(client: TestClient, auth_headers: dict, session: Session):
+    """Test notes cannot be filed into another user's folder."""
+    folder = Folder(name="Private", username="otheruser")
+    session.add(folder)
+    session.commit()
+    session.refresh(folder)
+
+    response = client.post("/notes/", json={"title": "Sneaky", "folder_id": folder.id}, headers=auth_headers)
+    assert response.status_code == 404
+
+
+def test_create_duplicate_folder(client: TestClient, auth_headers: dict):
+    """Test folder names are unique per user."""
+    assert client.post("/notes/folders", json={"name": "Work"}, headers=auth_headers).status_code == 200
+    response = client.post("/notes/folders", json={"name": "Work"}, headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_filter_notes_by_tag_and_folder(client: TestClient, auth_headers: dict):
+    """Test filtering notes by tag and folder."""
+    folder = client.post("/notes/folders", json={"name": "Work"}, headers=auth_headers).json()
+    client.post("/notes/", json={"title": "A", "tags": ["red"], "folder_id": folder["id"]}, headers=auth_headers)
+    client.post("/notes/", json={"title": "B", "tags": ["red", "blue"]}, headers=auth_headers)
+    client.post("/notes/", json={"title": "C", "tags": ["blue"], "folder_id": folder["id"]}, headers=auth_headers)
+
+    red = client.get("/notes/", params={"tag": "red", "sort": "title"}, headers=auth_headers).json()
+    assert [n["title"] for n in red] == ["A", "B"]
+
+    filed = client.get("/notes/", params={"folder_id": folder["id"], "sort": "-title"}, headers=auth_headers).json()
+    assert [n["title"] for n in filed] == ["C", "A"]
+
+    both = client.get("/notes/", params={"folder_id": folder["id"], "tag": "blue"}, headers=auth_headers).json()
+    assert [n["title"] for n in both] == ["C"]
+
+    unknown = client.get("/notes/", params={"tag": "green"}, headers=auth_headers).json()
+    assert unknown == []
+
+
+def test_tag_and_folder_counts(client: TestClient, auth_headers: dict, session: Session):
+    """Test per-tag and per-folder note counts."""
+    folder = client.post("/notes/folders", json={"name": "Work"}, headers=auth_headers).json()
+    client.post("/notes/folders", json={"name": "Empty"}, headers=auth_headers)
+    client.post("/notes/", json={"title": "A", "tags": ["red"], "folder_id": folder["id"]}, headers=auth_headers)
+    client.post("/notes/", json={"title": "B", "tags": ["red", "blue"]}, headers=auth_headers)
+
+    # Another user's tags must not be counted
+    other_note = Note(title="Other", username="otheruser")
+    other_tag = Tag(name="red", username="otheruser")
+    session.add(other_note)
+    session.add(other_tag)
+    session.commit()
+    session.add(NoteTag(note_id=other_note.id, tag_id=other_tag.id, username="otheruser"))
+    session.commit()
+
+    tags = client.get("/notes/tags", headers=auth_headers).json()
+    assert tags == [{"name": "blue", "count": 1}, {"name": "red", "count": 2}]
+
+    folders = client.get("/notes/folders", headers=auth_headers).json()
+    assert [(f["name"], f["note_count"]) for f in folders] == [("Empty", 0), ("Work", 1)]
+
+
+def test_update_note_tags(client: TestClient, auth_headers: dict):
+    """Test replacing a note's tags on update."""
+    note = client.post("/notes/", json={"title": "A", "tags": ["red"]}, headers=auth_headers).json()
+
+    response = client.put(f"/notes/{note['id']}", json={"tags": ["blue"]}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["tags"] == ["blue"]
+    assert response.json()["title"] == "A"
+
+    tags = client.get("/notes/tags", headers=auth_headers).json()
+    assert tags == [{"name": "blue", "count": 1}]
+
+
+def test_get_all_notes_as_admin(
+    client: TestClient, admin_headers: dict, session: Session, test_user: User, monkeypatch
+):
+    """Test admin can stream all notes page by page."""
+    monkeypatch.setattr(notes_router, "ADMIN_NOTES_CHUNK_SIZE", 2)
+    for i in range(7):
+        session.add(Note(title=f"Note {i}", content="Content", username=test_user.username if i % 2 else "admin"))
+    session.commit()
+
+    seen = []
+    params = {"limit": 3}
+    while True:
+        response = client.get("/notes/admin/all-notes", params=params, headers=admin_headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        page = [json.loads(line) for line in response.text.splitlines()]
+        assert len(page) <= 3
+        seen.extend(page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        params = {"limit": 3, "after": cursor}
+
+    assert len(seen) == 7
+    assert [n["id"] for n in seen] == sorted(n["id"] for n in seen)
+    assert {n["username"] for n in seen} == {"testuser", "admin"}
+
+
+def test_get_all_notes_as_regular_user(client: TestClient, auth_headers: dict):
+    """Test regular user cannot list all notes."""
+    response = client.get("/notes/admin/all-notes", headers=auth_headers)
+    assert response.status_code == 403
+
+
+def test_batch_get_notes(client: TestClient, auth_headers: dict, session: Session, test_user: User):
+    """Test fetching several notes in one request."""
+    note1 = Note(title="Note 1", content="Content 1", username=test_user.username)
+    note2 = Note(title="Note 2", content="Content 2", username=test_user.username)
+    other_note = Note(title="Other Note", content="Content", username="otheruser")
+    session.add_all([note1, note2, other_note])
+    session.commit()
+    fake_uuid = "550e8400-e29b-41d4-a716-446655440000"
+
+    response = client.post("/notes/batch-get", json={
+        "ids": [note2.id, fake_uuid, note1.id, other_note.id, note2.id]
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert [n["title"] for n in data["notes"]] == ["Note 2", "Note 1"]
+    assert data["missing"] == [fake_uuid, other_note.id]
+
+
+def test_batch_get_notes_limits(client: TestClient, auth_headers: dict):
+    """Test batch requests must name between one and the maximum number of notes."""
+    assert client.post("/notes/batch-get", json={"ids": []}, headers=auth_headers).status_code == 422
+    too_many = [str(i) for i in range(101)]
+    assert client.post("/notes/batch-get", json={"ids": too_many}, headers=auth_headers).status_code == 422
+
+
+def test_batch_get_notes_rate_limited_per_item(client: TestClient, auth_headers: dict, monkeypatch):
+    """Test each requested note counts against the batch rate limit."""
+    app.state.limiter.reset()
+    app.state.limiter.enabled = True
+    monkeypatch.setattr(app.state.limiter, "_headers_enabled", True)
+    try:
+        ids = [str(i) for i in range(100)]
+        for _ in range(3):
+            response = client.post("/notes/batch-get", json={"ids": ids}, headers=auth_headers)
+            assert response.status_code == 200
+        response = client.post("/notes/batch-get", json={"ids": ids[:1]}, headers=auth_headers)
+        assert response.status_code == 429
+        assert response.json() == {"error": "Rate limit exceeded: 300 per 1 minute"}
+        assert response.headers["X-RateLimit-Limit"] == "300"
+        assert response.headers["X-RateLimit-Remaining"] == "0"
+        assert "Retry-After" in response.headers
+    finally:
+        app.state.limiter.enabled = False
+        app.state.limiter.reset()
+
+
+def test_get_note_served_from_cache_until_write(client: TestClient, auth_headers: dict, session: Session, test_user: User):
+    """Test repeated reads hit the cache and writes invalidate it."""
+    note = client.post("/notes/", json={"title": "Cached", "content": "v1"}, headers=auth_headers).json()
+
+    for _ in range(3):
+        assert client.get(f"/notes/{note['id']}", headers=auth_headers).json()["content"] == "v1"
+        assert len(client.get("/notes/", headers=auth_headers).json()) == 1
+    stats = note_cache.stats()
+    assert (stats["misses"], stats["hits"]) == (2, 4)
+
+    client.put(f"/notes/{note['id']}", json={"content": "v2"}, headers=auth_headers)
+    assert client.get(f"/notes/{note['id']}", headers=auth_headers).json()["content"] == "v2"
+    assert client.get("/notes/", headers=auth_headers).json()[0]["content"] == "v2"
+
+    client.delete(f"/notes/{note['id']}", headers=auth_headers)
+    assert client.get(f"/notes/{note['id']}", headers=auth_headers).status_code == 404
+    assert client.get("/notes/", headers=auth_headers).json() == []
+
+
+def test_cache_stats_as_admin(client: TestClient, admin_headers: dict, auth_headers: dict):
+    """Test only admins can read cache metrics."""
+    response = client.get("/notes/admin/cache-stats", headers=admin_headers)
+    assert response.status_code == 200
+    assert "hit_ratio" in response.json()
+    assert client.get("/notes/admin/cache-stats", headers=auth_headers).status_code == 403
+
+
+def test_patch_note_interleaved_same_base(session: Session, test_user: User, monkeypatch):
+    """Test two requests that loaded the note before either applied cannot both win."""
+    monkeypatch.setattr(note_coalescer, "window", 60)
+    note = Note(title="Draft", content="abc", username=test_user.username)
+    session.add(note)
+    session.commit()
+    note_id = note.id
+
+    with Session(session.get_bind()) as session_a, Session(session.get_bind()) as session_b:
+        note_a = session_a.get(Note, note_id)
+        note_b = session_b.get(Note, note_id)
+
+        result = note_coalescer.apply(session_a, note_a, NotePatch(
+            base_version=1, edits=[TextEdit(start=3, end=3, text="A")]
+        ))
+        assert (result.version, result.content) == (2, "abcA")
+
+        with pytest.raises(StaleVersionError):
+            note_coalescer.apply(session_b, note_b, NotePatch(
+                base_version=1, edits=[TextEdit(start=3, end=3, text="B")]
+            ))
+
+    session.refresh(note)
+    assert (note.version, note.content) == (2, "abcA")
+
+
+def test_update_note_interleaved_with_patch(session: Session, test_user: User, monkeypatch):
+    """Test a PUT that loaded the note before a PATCH committed does not reuse its version."""
+    monkeypatch.setattr(note_coalescer, "window", 60)
+    note = Note(title="Draft", content="abc", username=test_user.username)
+    session.add(note)
+    session.commit()
+    note_id = note.id
+
+    with Session(session.get_bind()) as session_put, Session(session.get_bind()) as session_patch:
+        note_put = session_put.get(Note, note_id)
+        note_patch = session_patch.get(Note, note_id)
+
+        result = note_coalescer.apply(session_patch, note_patch, NotePatch(
+            base_version=1, edits=[TextEdit(start=3, end=3, text="A")]
+        ))
+        assert result.version == 2
+
+        note_coalescer.replace(session_put, note_put, {"title": "Renamed"})
+        assert (note_put.version, note_put.title, note_put.content) == (3, "Renamed", "abcA")
+
+    session.refresh(note)
+    assert (note.version, note.title, note.content) == (3, "Renamed", "abcA")
+
+
+def test_update_note_conflict(client: TestClient, auth_headers: dict, session: Session, test_user: User, monkeypatch):
+    """Test PUT returns 409 when another process writes between its read and its write."""
+    note = Note(title="Draft", content="abc", username=test_user.username)
+    session.add(note)
+    session.commit()
+
+    write = note_coalescer._write
+
+    def write_after_other_process(db_session, note_id, db_version, values):
+        db_session.exec(update(Note).where(Note.id == note_id).values(content="other", version=db_version + 1))
+        db_session.commit()
+        return write(db_session, note_id, db_version, values)
+
+    monkeypatch.setattr(note_coalescer, "_write", write_after_other_process)
+    response = client.put(f"/notes/{note.id}", json={"content": "mine"}, headers=auth_headers)
+    assert response.status_code == 409
+
+    session.refresh(note)
+    assert (note.version, note.content) == (2, "other")
+
+
+def test_patch_note_conditional_write(session: Session, test_user: User, monkeypatch):
+    """Test a write from another process makes buffered patches fail instead of overwriting it."""
+    monkeypatch.setattr(note_coalescer, "window", 60)
+    note = Note(title="Draft", content="", username=test_user.username)
+    session.add(note)
+    session.commit()
+
+    note_coalescer.apply(session, note, NotePatch(base_version=1, edits=[TextEdit(start=0, end=0, text="a")]))
+    note_coalescer.apply(session, note, NotePatch(base_version=2, edits=[TextEdit(start=1, end=1, text="b")]))
+
+    # Another process commits its own version behind this process's back
+    session.exec(update(Note).where(Note.id == note.id).values(content="other", version=7))
+    session.commit()
+
+    # Close the coalescing window so the next patch commits straight away
+    monkeypatch.setitem(note_coalescer._last_commit, note.id, 0)
+    with pytest.raises(StaleVersionError):
+        note_coalescer.apply(session, note, NotePatch(base_version=3, edits=[TextEdit(start=2, end=2, text="c")]))
+
+    session.refresh(note)
+    assert (note.version, note.content) == (7, "other")
+
+
+def test_patch_note_not_blocked_by_other_note(session: Session, test_user: User):
+    """Test work on one note does not wait for another note's lock."""
+    busy = Note(title="Busy", content="", username=test_user.username)
+    session.add(busy)
+    free = Note(title="Free", content="", username=test_user.username)
+    while note_coalescer._note_lock(free.id) is note_coalescer._note_lock(busy.id):
+        free = Note(title="Free", content="", username=test_user.username)
+    session.add(free)
+    session.commit()
+
+    done = threading.Event()
+
+    def patch_free():
+        note_coalescer.apply(session, free, NotePatch(base_version=1, edits=[TextEdit(start=0, end=0, text="x")]))
+        done.set()
+
+    with note_coalescer._note_lock(busy.id):
+        worker = threading.Thread(target=patch_free)
+        worker.start()
+        assert done.wait(5)
+    worker.join(5)
+    session.refresh(free)
+    assert free.content == "x"
+
+
+def test_patch_note_utf16_offsets(client: TestClient, auth_headers: dict, session: Session, test_user: User):
+    """Test edit offsets count UTF-16 code units, as browser editors do."""
+    note = Note(title="Emoji", content="a😀b", username=test_user.username)
+    session.add(note)
+    session.commit()
+    session.refresh(note)
+
+    # In JavaScript "a😀b".indexOf("b") is 3
+    response = client.patch(f"/notes/{note.id}", json={
+        "base_version": 1,
+        "edits": [{"start": 3, "end": 4, "text": "B"}, {"start": 1, "end": 3, "text": "🎉"}]
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["content"] == "a🎉B"
+
+    # An offset inside the surrogate pair of the emoji is rejected
+    response = client.patch(f"/notes/{note.id}", json={
+        "base_version": 2,
+        "edits": [{"start": 2, "end": 2, "text": "x"}]
+    }, headers=auth_headers)
+    assert response.status_code == 422
@@ -1,7 +1,9 @@
 """Tests for user endpoints."""
 import pytest
 from fastapi.testclient import TestClient
-from models import User
+from sqlmodel import Session, select
+from models import User, Note
+from jobs import job_queue
 
 
 def test_create_user_success(client: TestClient):
@@ -63,11 +65,41 @@ def test_count_users_as_admin(client: TestClient, admin_headers: dict, test_user
     assert data["total_users"] >= 2
 
 
-def test_delete_user_as_admin(client: TestClient, admin_headers: dict, test_user: User):
-    """Test deleting a user as admin."""
+def test_delete_user_as_admin(client: TestClient, admin_headers: dict, session: Session, test_user: User):
+    """Test deleting a user as admin runs as a background job."""
+    session.add(Note(title="Note", content="Content", username=test_user.username))
+    session.commit()
+    user_id = test_user.id
+
+    response = client.delete(f"/user/admin/delete/{user_id}", headers=admin_headers)
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert client.get(f"/jobs/{job_id}", headers=admin_headers).json()["status"] == "queued"
+
+    assert job_queue.run_next(session)
+
+    job = client.get(f"/jobs/{job_id}", headers=admin_headers).json()
+    assert job["status"] == "succeeded"
+    assert job["progress"] == 1.0
+    assert job["result"] == {"deleted_notes": 1}
+    assert session.get(User, user_id) is None
+    assert session.exec(select(Note)).all() == []
+
+
+def test_delete_user_revokes_access_before_job_runs(client: TestClient, admin_headers: dict, auth_headers: dict, test_user: User):
+    """Test a user scheduled for deletion cannot sign in or use their token, and keeps their username reserved."""
     response = client.delete(f"/user/admin/delete/{test_user.id}", headers=admin_headers)
-    assert response.status_code == 200
-    assert "deleted successfully" in response.json()["message"]
+    assert response.status_code == 202
+
+    assert client.get("/user", headers=auth_headers).status_code == 401
+    assert client.post("/notes", json={"title": "Late"}, headers=auth_headers).status_code == 401
+    response = client.post("/token", data={"username": "testuser", "password": "testpass123"})
+    assert response.status_code == 401
+    response = client.post("/user/create-user", json={"username": "testuser", "password": "password"})
+    assert response.status_code == 400
+
+    assert [u["username"] for u in client.get("/user/admin/list-all", headers=admin_headers).json()] == ["admin"]
+    assert client.delete(f"/user/admin/delete/{test_user.id}", headers=admin_headers).status_code == 404
 
 
 def test_delete_self_as_admin(client: TestClient, admin_headers: dict, admin_user: User):
@@ -81,3 +113,61 @@ def test_delete_user_as_regular_user(client: TestClient, auth_headers: dict, adm
     """Test regular user cannot delete users."""
     response = client.delete(f"/user/admin/delete/{admin_user.id}", headers=auth_headers)
     assert response.status_code == 403
+
+
+def test_list_users_includes_note_stats(client: TestClient, admin_headers: dict, session: Session, test_user: User):
+    """Test user listing carries note counts and storage bytes."""
+    session.add(Note(title="ab", content="cdé", username=test_user.username))
+    session.add(Note(title=None, content="xyz", username=test_user.username))
+    session.commit()
+
+    response = client.get("/user/admin/list-all", headers=admin_headers)
+    assert response.status_code == 200
+    stats = {u["username"]: u for u in response.json()}
+    assert stats["testuser"]["note_count"] == 2
+    assert stats["testuser"]["storage_bytes"] == 2 + 4 + 3
+    assert stats["admin"]["note_count"] == 0
+    assert stats["admin"]["storage_bytes"] == 0
+
+
+def test_list_users_keyset_pagination(client: TestClient, admin_headers: dict, session: Session):
+    """Test paging through users with the next cursor."""
+    for name in ["carol", "alice", "bob", "dave"]:
+        session.add(User(username=name, password="x"))
+    session.commit()
+
+    seen = []
+    params = {"limit": 2}
+    while True:
+        response = client.get("/user/admin/list-all", params=params, headers=admin_headers)
+        assert response.status_code == 200
+        page = [u["username"] for u in response.json()]
+        assert len(page) <= 2
+        seen.extend(page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        params = {"limit": 2, "after": cursor}
+
+    assert seen == ["admin", "alice", "bob", "carol", "dave"]
+
+
+def test_list_users_prefix_search(client: TestClient, admin_headers: dict, session: Session):
+    """Test filtering users by username prefix."""
+    for name in ["anna", "annabel", "ann", "anton", "bob"]:
+        session.add(User(username=name, password="x"))
+    session.commit()
+
+    response = client.get("/user/admin/list-all", params={"prefix": "ann"}, headers=admin_headers)
+    assert [u["username"] for u in response.json()] == ["ann", "anna", "annabel"]
+
+    response = client.get("/user/admin/list-all", params={"prefix": "ann", "limit": 1, "after": "ann"}, headers=admin_headers)
+    assert [u["username"] for u in response.json()] == ["anna"]
+    assert response.headers["X-Next-Cursor"] == "anna"
+
+
+def test_list_users_cursor_exposed_to_browsers(client: TestClient, admin_headers: dict):
+    """Test cross-origin clients may read the pagination cursor header."""
+    headers = {**admin_headers, "Origin": "http://localhost:3000"}
+    response = client.get("/user/admin/list-all", params={"limit": 1}, headers=headers)
+    assert "X-Next-Cursor" in response.headers["access-control-expose-headers"]